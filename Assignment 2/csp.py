@@ -1,4 +1,20 @@
-from typing import Any, Iterable
+from collections import deque
+import math
+from math import isqrt
+import random
+from typing import Any, Callable, Iterable
+
+VARIABLE_ORDERS = ["static", "mrv", "domwdeg"]
+VALUE_ORDERS = ["static", "lcv"]
+INFERENCES = ["none", "forward_checking", "mac"]
+
+# dom/wdeg with inference restarts the search after RESTART_FAILURES
+# failures, and after RESTART_GROWTH times as many as last time after that
+RESTART_FAILURES = 100
+RESTART_GROWTH = 1.5
+
+# Marks the variables of CSP.values that have no value yet
+UNASSIGNED: Any = object()
 
 
 class CSP:
@@ -7,6 +23,9 @@ class CSP:
         variables: list[str],
         domains: dict[str, set],
         edges: list[tuple[str, str]],
+        bitmask: bool = False,
+        alldiffs: list[list[str]] | None = None,
+        coordinates: dict[str, tuple[int, int]] | None = None,
     ):
         """Constructs a CSP instance with the given variables, domains, and edges.
 
@@ -14,66 +33,222 @@ class CSP:
             variables: The variables for the CSP
             domains: The domains of the variables
             edges: Pairs of variables that must not be assigned the same value
+            bitmask: Whether to search with each domain held as an int with
+                one bit per value in value_table, instead of as a set
+            alldiffs: Groups of variables that must all be assigned different
+                values, kept as global constraints instead of as edges
+            coordinates: The row and column, from 0, of each variable of a
+                Sudoku grid, for the Sudoku helpers. By default they are
+                read from names like X11 of a 9x9 grid.
         """
         self.variables = variables
         self.domains = domains
+        self.bitmask = bitmask
 
         self.backtrack_called = 0
         self.backtrack_failures = 0
 
-        # Binary constraints as a dictionary mapping variable pairs to a set of value pairs.
+        # Binary constraints as the set of variable pairs that must not be
+        # assigned the same value.
         #
         # To check if variable_1=value1, variable_2=value2 is in violation of a binary constraint:
-        # if (
-        #     (variable_1, variable_2) in self.binary_constraints and
-        #     (value1, value2) not in self.binary_constraints[(variable_1, variable_2)]
-        # ) or (
-        #     (variable_2, variable_1) in self.binary_constraints and
-        #     (value1, value2) not in self.binary_constraints[(variable_2, variable_1)]
+        # if value1 == value2 and (
+        #     (variable_1, variable_2) in self.binary_constraints or
+        #     (variable_2, variable_1) in self.binary_constraints
         # ):
         #     Violates a binary constraint
-        self.binary_constraints: dict[tuple[str, str], set] = {}
+        self.binary_constraints: set[tuple[str, str]] = set(edges)
+
+        # The variables that share a constraint with each variable
+        self.neighbors: dict[str, list[str]] = {variable: [] for variable in variables}
+        neighbor_sets: dict[str, set[str]] = {variable: set() for variable in variables}
+
+        def add_neighbors(variable_1: str, variable_2: str) -> None:
+            if variable_2 not in neighbor_sets[variable_1]:
+                neighbor_sets[variable_1].add(variable_2)
+                neighbor_sets[variable_2].add(variable_1)
+                self.neighbors[variable_1].append(variable_2)
+                self.neighbors[variable_2].append(variable_1)
+
+        for variable_1, variable_2 in self.binary_constraints:
+            add_neighbors(variable_1, variable_2)
+
+        for group in alldiffs or []:
+            for i, variable_1 in enumerate(group):
+                for variable_2 in group[i + 1 :]:
+                    add_neighbors(variable_1, variable_2)
+
+        # The search works on variable indexes: adjacency holds the indexes of
+        # the neighbors of each variable, and values the flat assignment
+        self.index = {variable: i for i, variable in enumerate(variables)}
+        self.adjacency = [
+            [self.index[neighbor] for neighbor in self.neighbors[variable]]
+            for variable in variables
+        ]
+        self.values = [UNASSIGNED] * len(variables)
+
+        # The alldiff constraints as lists of variable indexes, the ones each
+        # variable is in, and the last matching of values to the variables
+        # of each, by position, which the next filtering starts from
+        self.alldiffs = [
+            [self.index[variable] for variable in group] for group in alldiffs or []
+        ]
+        self.alldiffs_of: list[list[int]] = [[] for _ in variables]
+        self.matchings: list[list[Any]] = [[] for _ in self.alldiffs]
+
+        for number, indexes in enumerate(self.alldiffs):
+            for index in indexes:
+                self.alldiffs_of[index].append(number)
+
+        # The heuristics backtrack uses, set by backtracking_search
+        self.variable_order = "static"
+        self.value_order = "static"
+        self.inference = "none"
+
+        # For the heuristics, how many assigned neighbors have each value of
+        # an unassigned variable, how many of its values no assigned neighbor
+        # has, and how many of its neighbors are unassigned. candidates holds
+        # the unassigned variables by their number of remaining values, and
+        # weights starts above the number of neighbors of each variable and
+        # grows with every domain wipeout it takes part in. heaviest is the
+        # largest weight, and tiebreak ranks variables dom/wdeg finds equal.
+        self.conflicts: list[dict[Any, int]] = []
+        self.remaining: list[int] = []
+        self.unassigned_degree: list[int] = []
+        self.candidates: list[set[int]] = []
+        self.weights: list[int] = []
+        self.heaviest = 0
+        self.tiebreak: list[int] = []
+
+        # The search gives up to restart once backtrack_failures reaches
+        # failure_limit, and restarting tells the levels above it to unwind
+        self.failure_limit: float = math.inf
+        self.restarting = False
+
+        # With inference, the search prunes the domains of the variable at
+        # each index, current in set mode and masks in bitmask mode, and the
+        # trail holds (index, removed values) to undo the pruning with
+        self.current: list[set] = []
+        self.trail: list[tuple[int, Any]] = []
+
+        # In bitmask mode, masks holds the domain of the variable at each
+        # index, and domains is only updated from it after ac_3
+        self.value_table: list = []
+        self.value_bits: dict[Any, int] = {}
+        self.masks: list[int] = []
+
+        if bitmask:
+            all_values = {value for domain in domains.values() for value in domain}
+
+            try:
+                self.value_table = sorted(all_values)
+            except TypeError:
+                self.value_table = list(all_values)
+
+            self.value_bits = {
+                value: 1 << i for i, value in enumerate(self.value_table)
+            }
+            self.masks = [self.to_mask(domains[variable]) for variable in variables]
+
+        # The bits of variable j's values that support each value of
+        # variable i, by arc (i, j) and value position
+        self.supports: dict[tuple[int, int], list[int]] = {}
+
+        if bitmask:
+            every_value = (1 << len(self.value_table)) - 1
+
+            # every constraint is not-equal, so each value is supported by
+            # all the others
+            not_equal = [every_value & ~(1 << i) for i in range(len(self.value_table))]
+
+            for i, neighbors in enumerate(self.adjacency):
+                for j in neighbors:
+                    self.supports[(i, j)] = not_equal
+
+        # The variables in each row, column and box of a Sudoku grid, by
+        # ("row", number) and so on, for the Sudoku helpers, built on first use
+        self.coordinates = coordinates
+        self.variables_by_unit: dict[tuple[str, int], list[str]] = {}
+
+    def to_mask(self, values: Iterable) -> int:
+        mask = 0
+
+        for value in values:
+            mask |= self.value_bits[value]
+
+        return mask
+
+    def mask_values(self, mask: int) -> Iterable:
+        """Yields the values of the bits in mask, lowest bit first."""
+        while mask:
+            low_bit = mask & -mask
+            yield self.value_table[low_bit.bit_length() - 1]
+            mask ^= low_bit
+
+    def domain_size(self, variable: str) -> int:
+        if self.bitmask:
+            return self.masks[self.index[variable]].bit_count()
+
+        return len(self.domains[variable])
+
+    def domain_values(self, index: int) -> Iterable:
+        """Yields the values in the domain of the variable at index."""
+        if self.bitmask:
+            return self.mask_values(self.masks[index])
+
+        return self.domains[self.variables[index]]
+
+    def snapshot(self) -> list[int]:
+        """Returns a copy of the bitmask domains to restore later."""
+        return self.masks.copy()
+
+    def restore(self, snapshot: list[int]) -> None:
+        self.masks[:] = snapshot
+
+    def sync_domains(self) -> None:
+        """Rebuilds domains from the bitmask domains."""
+        for variable, mask in zip(self.variables, self.masks):
+            self.domains[variable] = set(self.mask_values(mask))
+
+    def get_unit(self, variable: str, unit: str) -> Iterable[str]:
+        """Gets all other variables in the same "row", "column" or "box"."""
+        if not self.variables_by_unit:
+            if self.coordinates is None:
+                self.coordinates = {
+                    i: (int(i[1]) - 1, int(i[2]) - 1) for i in self.variables
+                }
+
+            for i in self.variables:
+                for key in self.units(i):
+                    self.variables_by_unit.setdefault(key, []).append(i)
+
+        for key in self.units(variable):
+            if key[0] == unit:
+                for i in self.variables_by_unit[key]:
+                    if i != variable:
+                        yield i
 
-        for variable_1, variable_2 in edges:
-            self.binary_constraints[(variable_1, variable_2)] = set()
+    def units(self, variable: str) -> list[tuple[str, int]]:
+        """Returns the keys of the row, column and box of variable."""
+        assert self.coordinates is not None
 
-            for value1 in self.domains[variable_1]:
-                for value2 in self.domains[variable_2]:
-                    if value1 == value2:
-                        continue
+        row, column = self.coordinates[variable]
+        box_width = isqrt(isqrt(len(self.coordinates)))
+        box = row // box_width * box_width + column // box_width
 
-                    self.binary_constraints[(variable_1, variable_2)].add(
-                        (value1, value2)
-                    )
-                    self.binary_constraints[(variable_1, variable_2)].add(
-                        (value2, value1)
-                    )
+        return [("row", row), ("column", column), ("box", box)]
 
     def get_column(self, variable: str) -> Iterable[str]:
         """Gets all variables in the same column as the input variable."""
         # X11
         # -> X11, X21, X31, X41, X51, X61, X71, X81, X91
-        for i in self.variables:
-            if i == variable:
-                continue
-
-            if i[2] != variable[2]:
-                continue
-
-            yield i
+        return self.get_unit(variable, "column")
 
     def get_row(self, variable: str) -> Iterable[str]:
         """Gets all variables in the same row as the input variable."""
         # X11
         # -> X11, X12, X13, X14, X15, X16, X17, X18, X19
-        for i in self.variables:
-            if i == variable:
-                continue
-
-            if i[1] != variable[1]:
-                continue
-
-            yield i
+        return self.get_unit(variable, "row")
 
     def get_subgrid(self, variable: str) -> Iterable[str]:
         """Gets all variables in the same subgrid as the input variable."""
@@ -81,20 +256,7 @@ class CSP:
         # -> X11, X12, X13
         # -> X21, X22, X23
         # -> X31, X32, X33
-        row_index = int(variable[1])
-        column_index = int(variable[2])
-
-        start_row = (row_index - 1) // 3 * 3 + 1
-        start_column = (column_index - 1) // 3 * 3 + 1
-
-        for i in range(3):
-            for j in range(3):
-                value = f"X{start_row + i}{start_column + j}"
-
-                if value == variable:
-                    continue
-
-                yield value
+        return self.get_unit(variable, "box")
 
     def get_related_values(self, variable: str) -> set:
         """Returns all values that are related to the input variable."""
@@ -111,30 +273,315 @@ class CSP:
 
         return related_values
 
+    def satisfies(
+        self, variable_1: str, value1: Any, variable_2: str, value2: Any
+    ) -> bool:
+        """Checks variable_1=value1, variable_2=value2 against the constraints."""
+        if value1 != value2:
+            return True
+
+        edges = self.binary_constraints
+
+        if (variable_1, variable_2) in edges or (variable_2, variable_1) in edges:
+            return False
+
+        alldiffs = self.alldiffs_of[self.index[variable_2]]
+
+        return not any(
+            number in alldiffs for number in self.alldiffs_of[self.index[variable_1]]
+        )
+
+    def revise(self, variable_1: str, variable_2: str) -> bool:
+        """Removes the values of variable_1 that no value of variable_2 supports.
+
+        Returns:
+            True if the domain of variable_1 shrank
+        """
+        if self.bitmask:
+            return self.revise_mask(self.index[variable_1], self.index[variable_2])
+
+        domain_2 = self.domains[variable_2]
+        unsupported = {
+            value1
+            for value1 in self.domains[variable_1]
+            if not any(
+                self.satisfies(variable_1, value1, variable_2, value2)
+                for value2 in domain_2
+            )
+        }
+
+        self.domains[variable_1] -= unsupported
+
+        return bool(unsupported)
+
+    def unsupported_bits(self, i: int, j: int) -> int:
+        """Returns the bits of the values of variable i that no value of
+        variable j supports, by their bitmask domains."""
+        mask_j = self.masks[j]
+        supports = self.supports[(i, j)]
+        unsupported = 0
+        bits = self.masks[i]
+
+        while bits:
+            low_bit = bits & -bits
+            bits ^= low_bit
+
+            if not supports[low_bit.bit_length() - 1] & mask_j:
+                unsupported |= low_bit
+
+        return unsupported
+
+    def revise_mask(self, i: int, j: int) -> bool:
+        """revise for the bitmask domains of the variables at indexes i and j."""
+        unsupported = self.unsupported_bits(i, j)
+        self.masks[i] &= ~unsupported
+
+        return bool(unsupported)
+
+    def alldiff_removals(
+        self, number: int, domain_values: Callable[[int], Iterable]
+    ) -> list[tuple[int, Any]] | None:
+        """Filters the alldiff constraint number by matching, after Régin.
+
+        A maximum matching of the variables to their values tells whether
+        the variables can still all differ. A value is only kept if some
+        maximum matching uses it: when it is matched, when it is on an
+        alternating cycle, or when an alternating path from a value no
+        variable is matched to reaches it.
+
+        Args:
+            number: The index of the constraint in self.alldiffs
+            domain_values: Returns the values of the variable at an index
+
+        Returns:
+            None if the variables can not all differ, otherwise (index,
+            removed values) for the variables that lose values, as bits in
+            bitmask mode and as a set otherwise
+        """
+        group = self.alldiffs[number]
+
+        # the domains as masks, over the value table in bitmask mode and
+        # over the values of the group otherwise
+        if self.bitmask:
+            value_table = self.value_table
+            value_bits = self.value_bits
+            masks = [self.masks[index] for index in group]
+        else:
+            domains = [domain_values(index) for index in group]
+            value_table = list({value for domain in domains for value in domain})
+            value_bits = {value: 1 << i for i, value in enumerate(value_table)}
+            masks = [sum(value_bits[value] for value in domain) for domain in domains]
+
+        # the matched value of each variable as a bit, starting from the last
+        # matching without the values that were pruned since
+        matched = [0] * len(group)
+        owner: dict[int, int] = {}
+
+        for position, value in enumerate(self.matchings[number]):
+            bit = value_bits.get(value, 0)
+
+            if bit & masks[position] and bit not in owner:
+                matched[position] = bit
+                owner[bit] = position
+
+        seen = 0
+
+        def augment(position: int) -> bool:
+            nonlocal seen
+            bits = masks[position] & ~seen
+
+            while bits:
+                bit = bits & -bits
+                bits ^= bit
+
+                if seen & bit:
+                    continue
+
+                seen |= bit
+                other = owner.get(bit)
+
+                if other is None or augment(other):
+                    matched[position] = bit
+                    owner[bit] = position
+                    return True
+
+            return False
+
+        for position in range(len(group)):
+            seen = 0
+
+            if not matched[position] and not augment(position):
+                return None
+
+        self.matchings[number] = [value_table[bit.bit_length() - 1] for bit in matched]
+
+        # matched edges point from a variable to its value and the others
+        # from a value to the variables, so paths alternate. The values an
+        # alternating path from a free value reaches are all kept.
+        every_value = 0
+
+        for mask in masks:
+            every_value |= mask
+
+        reached_values = every_value & ~sum(matched)
+        unreached = set(range(len(group)))
+
+        while True:
+            reached = [
+                position for position in unreached if masks[position] & reached_values
+            ]
+
+            if not reached:
+                break
+
+            for position in reached:
+                unreached.remove(position)
+                reached_values |= matched[position]
+
+        # the values on alternating cycles are kept too, which are the values
+        # matched in the same strongly connected component of the graph with
+        # an edge from each variable to the variables its value is possible
+        # for (Tarjan's algorithm). Everything a reached variable leads to is
+        # reached, and nothing leads to a variable with one value, so only
+        # the other variables can share a component.
+        cyclic = [
+            position
+            for position in unreached
+            if masks[position] & (masks[position] - 1)
+        ]
+        component: dict[int, int] = {}
+        order: dict[int, int] = {}
+        low: dict[int, int] = {}
+        path: list[int] = []
+        component_values: list[int] = []
+
+        def connect(position: int) -> None:
+            order[position] = low[position] = len(order)
+            path.append(position)
+            bit = matched[position]
+
+            for other in cyclic:
+                if other == position or not masks[other] & bit:
+                    continue
+
+                if other not in order:
+                    connect(other)
+                    low[position] = min(low[position], low[other])
+                elif other not in component:
+                    low[position] = min(low[position], order[other])
+
+            if low[position] == order[position]:
+                values = 0
+
+                while True:
+                    member = path.pop()
+                    component[member] = len(component_values)
+                    values |= matched[member]
+
+                    if member == position:
+                        break
+
+                component_values.append(values)
+
+        for position in cyclic:
+            if position not in order:
+                connect(position)
+
+        removals: list[tuple[int, Any]] = []
+
+        for position, mask in enumerate(masks):
+            kept = matched[position] | reached_values
+
+            if position in component:
+                kept |= component_values[component[position]]
+
+            removed = mask & ~kept
+
+            if not removed:
+                continue
+
+            if self.bitmask:
+                removals.append((group[position], removed))
+            else:
+                values = {value for value in value_table if value_bits[value] & removed}
+                removals.append((group[position], values))
+
+        return removals
+
     def ac_3(self) -> bool:
         """Performs AC-3 on the CSP.
 
+        Every arc (X, Y) starts in the queue. When revising X against Y
+        shrinks the domain of X, the arcs (Z, X) from the other neighbors Z
+        of X are queued again, until no domain changes anymore. The alldiff
+        constraints are filtered whenever the queue runs empty, for as long
+        as one of their variables has lost values since they last were.
+
         Returns:
             False if a domain becomes empty, otherwise True
         """
-        for i in self.domains:
-            value = self.domains[i]
+        queue = deque(
+            (variable, neighbor)
+            for variable in self.variables
+            for neighbor in self.neighbors[variable]
+        )
+        queued = set(queue)
+        pending = set(range(len(self.alldiffs)))
+
+        def shrunk(variable: str, neighbor: str | None) -> None:
+            for other in self.neighbors[variable]:
+                if other != neighbor and (other, variable) not in queued:
+                    queue.append((other, variable))
+                    queued.add((other, variable))
+
+        consistent = True
+
+        while queue or pending:
+            if not queue:
+                number = pending.pop()
+                removals = self.alldiff_removals(number, self.domain_values)
+
+                if removals is None:
+                    consistent = False
+                    break
+
+                for index, removed in removals:
+                    variable = self.variables[index]
+
+                    if self.bitmask:
+                        self.masks[index] &= ~removed
+                    else:
+                        self.domains[variable] -= removed
 
-            if len(value) != 1:
+                    shrunk(variable, None)
+                    pending.update(self.alldiffs_of[index])
+
+                # the filtering leaves its own constraint consistent
+                pending.discard(number)
                 continue
 
-            # remove impossible domain values from related variables
-            for j in self.get_related_values(i):
-                self.domains[j] -= value
+            arc = queue.popleft()
+            queued.remove(arc)
+            variable, neighbor = arc
+
+            if not self.revise(variable, neighbor):
+                continue
+
+            if not self.domain_size(variable):
+                consistent = False
+                break
+
+            shrunk(variable, neighbor)
+            pending.update(self.alldiffs_of[self.index[variable]])
 
-        return all(len(self.domains[i]) > 0 for i in self.domains)
+        if self.bitmask:
+            self.sync_domains()
+
+        return consistent
 
     def are_neighbors(self, a: str, b: str) -> bool:
-        # if they exist in the binary constraints, they are neighbors
-        return (a, b) in self.binary_constraints or (
-            b,
-            a,
-        ) in self.binary_constraints
+        # if they share a constraint, they are neighbors
+        return b in self.neighbors[a]
 
     def get_neighbor(self, var: str):
         for neighbor in self.variables:
@@ -144,56 +591,612 @@ class CSP:
             yield neighbor
 
     def is_allowed(self, var: str, value: Any, assignment: dict[str, Any]) -> bool:
-        for neighbor in self.get_neighbor(var):
-            # neighbor has not been assigned
-            if neighbor not in assignment:
-                continue
+        for neighbor in self.neighbors[var]:
+            # neighbors cannot have the same value
+            if neighbor in assignment and assignment[neighbor] == value:
+                return False
 
-            neighbor_value = assignment[neighbor]
+        return True
 
-            # neighbors cannot have the same value
-            if self.are_neighbors(var, neighbor) and value == neighbor_value:
+    def is_allowed_index(self, index: int, value: Any) -> bool:
+        """is_allowed for the variable at index and the assignment in self.values."""
+        values = self.values
+
+        for neighbor in self.adjacency[index]:
+            if values[neighbor] == value:
                 return False
 
         return True
 
-    def backtrack(self, assignment: dict[str, Any]) -> dict[str, Any]:
-        """The recursive backtracking function."""
+    def backtrack_index(self, start: int) -> bool:
+        """Backtracks on self.values, from the first unassigned variable at or
+        after start.
+
+        Returns:
+            True if self.values holds a solution, otherwise False
+        """
+        self.backtrack_called += 1
+
+        values = self.values
+        index = start
+
+        while index < len(values) and values[index] is not UNASSIGNED:
+            index += 1
+
+        # we have a solution when all variables are assigned
+        if index == len(values):
+            return True
+
+        for value in self.domain_values(index):
+            if self.is_allowed_index(index, value):
+                # assign the value
+                values[index] = value
+
+                # recursively call itself till its done
+                if self.backtrack_index(index + 1):
+                    return True
+
+                # no result, remove assignment (backtrack)
+                self.backtrack_failures += 1
+                values[index] = UNASSIGNED
+
+        return False
+
+    def assign(self, index: int, value: Any) -> None:
+        """Assigns value to the variable at index and updates the counts of
+        its unassigned neighbors."""
+        values = self.values
+        remaining = self.remaining
+        candidates = self.candidates
+
+        values[index] = value
+        candidates[remaining[index]].remove(index)
+
+        for neighbor in self.adjacency[index]:
+            self.unassigned_degree[neighbor] -= 1
+
+            if values[neighbor] is not UNASSIGNED:
+                continue
+
+            conflicts = self.conflicts[neighbor]
+            count = conflicts.get(value)
+
+            if count is None:
+                continue
+
+            conflicts[value] = count + 1
+
+            if count == 0:
+                candidates[remaining[neighbor]].remove(neighbor)
+                remaining[neighbor] -= 1
+                candidates[remaining[neighbor]].add(neighbor)
+
+    def unassign(self, index: int) -> None:
+        """Undoes assign, which must have been the last one not undone."""
+        values = self.values
+        remaining = self.remaining
+        candidates = self.candidates
+
+        value = values[index]
+        values[index] = UNASSIGNED
+        candidates[remaining[index]].add(index)
+
+        for neighbor in self.adjacency[index]:
+            self.unassigned_degree[neighbor] += 1
+
+            if values[neighbor] is not UNASSIGNED:
+                continue
+
+            conflicts = self.conflicts[neighbor]
+            count = conflicts.get(value)
+
+            if count is None:
+                continue
+
+            conflicts[value] = count - 1
+
+            if count == 1:
+                candidates[remaining[neighbor]].remove(neighbor)
+                remaining[neighbor] += 1
+                candidates[remaining[neighbor]].add(neighbor)
+
+    def select_variable(self) -> int:
+        """Returns the unassigned variable with the fewest remaining values,
+        ties going to the one with the most unassigned neighbors, or for
+        dom/wdeg the fewest remaining values per weight."""
+        if self.variable_order == "static":
+            return self.values.index(UNASSIGNED)
+
+        if self.variable_order == "domwdeg":
+            weights = self.weights
+            tiebreak = self.tiebreak
+            best = -1
+            best_key = (math.inf, 0)
+
+            # no variable with more values can beat best_key, even with the
+            # heaviest weight
+            for size, candidates in enumerate(self.candidates):
+                if size / self.heaviest > best_key[0]:
+                    break
+
+                for index in candidates:
+                    key = (size / weights[index], tiebreak[index])
+
+                    if key < best_key:
+                        best = index
+                        best_key = key
+
+            if best < 0:
+                raise ValueError("every variable is assigned")
+
+            return best
+
+        for candidates in self.candidates:
+            if candidates:
+                return min(
+                    candidates,
+                    key=lambda index: (-self.unassigned_degree[index], index),
+                )
+
+        raise ValueError("every variable is assigned")
+
+    def order_values(self, index: int) -> list[Any]:
+        """Returns the values no assigned neighbor has, the ones that leave
+        the most values to the unassigned neighbors first for LCV."""
+        if self.inference != "none":
+            return self.order_current_values(index)
+
+        conflicts = self.conflicts[index]
+        values = [value for value in conflicts if conflicts[value] == 0]
+
+        if self.value_order == "static":
+            return values
+
+        def ruled_out(value: Any) -> int:
+            return sum(
+                1
+                for neighbor in self.adjacency[index]
+                if self.values[neighbor] is UNASSIGNED
+                and self.conflicts[neighbor].get(value) == 0
+            )
+
+        # sorted() is stable, so values ruling out as much keep their order
+        return sorted(values, key=ruled_out)
+
+    def backtrack_ordered(self, unassigned: int) -> bool:
+        """Backtracks on self.values using the counts kept by assign.
+
+        Returns:
+            True if self.values holds a solution, otherwise False
+        """
         self.backtrack_called += 1
 
         # we have a solution when all variables are assigned
-        if len(assignment) == len(self.variables):
-            return assignment
+        if unassigned == 0:
+            return True
+
+        index = self.select_variable()
+
+        for value in self.order_values(index):
+            self.assign(index, value)
+
+            if self.backtrack_ordered(unassigned - 1):
+                return True
+
+            # no result, remove assignment (backtrack)
+            self.backtrack_failures += 1
+            self.unassign(index)
+
+        return False
+
+    def current_size(self, index: int) -> int:
+        if self.bitmask:
+            return self.masks[index].bit_count()
+
+        return len(self.current[index])
+
+    def current_values(self, index: int) -> Iterable:
+        if self.bitmask:
+            return self.mask_values(self.masks[index])
+
+        return self.current[index]
+
+    def unsupported(self, i: int, j: int) -> Any:
+        """Returns the values of variable i that no current value of variable
+        j supports, as bits in bitmask mode and as a set otherwise."""
+        if self.bitmask:
+            return self.unsupported_bits(i, j)
+
+        variable_1 = self.variables[i]
+        variable_2 = self.variables[j]
+        domain_2 = self.current[j]
+
+        return {
+            value1
+            for value1 in self.current[i]
+            if not any(
+                self.satisfies(variable_1, value1, variable_2, value2)
+                for value2 in domain_2
+            )
+        }
+
+    def remove_values(self, index: int, removed: Any) -> None:
+        """Prunes removed from the domain of the variable at index and
+        records it on the trail."""
+        if self.bitmask:
+            self.masks[index] &= ~removed
+        else:
+            self.current[index] -= removed
+
+        self.trail.append((index, removed))
+        self.resize(index)
+
+    def undo(self, mark: int) -> None:
+        """Restores the values pruned since the trail was mark entries long."""
+        trail = self.trail
+
+        while len(trail) > mark:
+            index, removed = trail.pop()
+
+            if self.bitmask:
+                self.masks[index] |= removed
+            else:
+                self.current[index] |= removed
+
+            self.resize(index)
+
+    def resize(self, index: int) -> None:
+        """Moves the variable at index to the candidates of its domain size."""
+        size = self.current_size(index)
+
+        if self.values[index] is UNASSIGNED:
+            self.candidates[self.remaining[index]].remove(index)
+            self.candidates[size].add(index)
+
+        self.remaining[index] = size
+
+    def add_weight(self, indexes: Iterable[int]) -> None:
+        """Adds one to the weights of the variables of a domain wipeout."""
+        weights = self.weights
+
+        for index in indexes:
+            weights[index] += 1
+            self.heaviest = max(self.heaviest, weights[index])
+
+    def propagate(self, queue: deque[tuple[int, int]], pending: set[int]) -> bool:
+        """AC-3 on the current domains, starting from the arcs in queue and
+        only queueing arcs into unassigned variables, with the alldiff
+        constraints in pending filtered whenever the queue runs empty.
+
+        Returns:
+            False if a domain becomes empty, otherwise True
+        """
+        queued = set(queue)
+        values = self.values
+
+        def shrunk(i: int, j: int | None) -> None:
+            pending.update(self.alldiffs_of[i])
+
+            # every constraint is not-equal, which only rules out values of
+            # the neighbors once a domain is down to one value
+            if self.remaining[i] != 1:
+                return
+
+            for k in self.adjacency[i]:
+                if k != j and values[k] is UNASSIGNED and (k, i) not in queued:
+                    queue.append((k, i))
+                    queued.add((k, i))
+
+        while queue or pending:
+            if not queue:
+                number = pending.pop()
+                removals = self.alldiff_removals(number, self.current_values)
+
+                if removals is None:
+                    self.add_weight(self.alldiffs[number])
+                    return False
+
+                for index, removed in removals:
+                    self.remove_values(index, removed)
+                    shrunk(index, None)
+
+                pending.discard(number)
+                continue
+
+            arc = queue.popleft()
+            queued.remove(arc)
+            i, j = arc
+            removed = self.unsupported(i, j)
 
-        for var in self.variables:
-            # it is already assigned
-            if var in assignment:
+            if not removed:
                 continue
 
-            for value in self.domains[var]:
-                if self.is_allowed(var, value, assignment):
-                    # assign the value
-                    assignment[var] = value
+            self.remove_values(i, removed)
 
-                    # recursively call itself till its done
-                    result = self.backtrack(assignment)
+            if not self.remaining[i]:
+                self.add_weight((i, j))
+                return False
+
+            shrunk(i, j)
+
+        return True
+
+    def assign_propagating(self, index: int, value: Any) -> bool:
+        """Assigns value to the variable at index and prunes the domains of
+        its unassigned neighbors, then of theirs too with MAC.
+
+        Returns:
+            False if a domain became empty, otherwise True
+        """
+        self.values[index] = value
+        self.candidates[self.remaining[index]].remove(index)
+
+        for neighbor in self.adjacency[index]:
+            self.unassigned_degree[neighbor] -= 1
+
+        # the domain of an assigned variable is its value
+        others: int | set[Any]
+
+        if self.bitmask:
+            others = self.masks[index] & ~self.value_bits[value]
+        else:
+            others = self.current[index] - {value}
+
+        if others:
+            self.remove_values(index, others)
+
+        queue = deque(
+            (neighbor, index)
+            for neighbor in self.adjacency[index]
+            if self.values[neighbor] is UNASSIGNED
+        )
+
+        if self.inference == "mac":
+            return self.propagate(queue, set(self.alldiffs_of[index]))
+
+        # forward checking only revises the neighbors against the value
+        for neighbor, _ in queue:
+            removed = self.unsupported(neighbor, index)
+
+            if removed:
+                self.remove_values(neighbor, removed)
+
+                if not self.remaining[neighbor]:
+                    self.add_weight((index, neighbor))
+                    return False
+
+        return True
+
+    def unassign_propagating(self, index: int) -> None:
+        """Undoes the assignment of assign_propagating, after its pruning has
+        been undone."""
+        self.values[index] = UNASSIGNED
+        self.candidates[self.remaining[index]].add(index)
+
+        for neighbor in self.adjacency[index]:
+            self.unassigned_degree[neighbor] += 1
+
+    def order_current_values(self, index: int) -> list[Any]:
+        """order_values for the current domains of the search with inference."""
+        values = list(self.current_values(index))
+
+        if self.value_order == "static":
+            return values
+
+        variable = self.variables[index]
+        neighbors = [
+            neighbor
+            for neighbor in self.adjacency[index]
+            if self.values[neighbor] is UNASSIGNED
+        ]
+
+        def ruled_out(value: Any) -> int:
+            if self.bitmask:
+                position = self.value_bits[value].bit_length() - 1
+
+                return sum(
+                    (
+                        self.masks[neighbor]
+                        & ~self.supports[(index, neighbor)][position]
+                    ).bit_count()
+                    for neighbor in neighbors
+                )
+
+            return sum(
+                1
+                for neighbor in neighbors
+                for neighbor_value in self.current[neighbor]
+                if not self.satisfies(
+                    variable, value, self.variables[neighbor], neighbor_value
+                )
+            )
+
+        # sorted() is stable, so values ruling out as much keep their order
+        return sorted(values, key=ruled_out)
+
+    def backtrack_propagating(self, unassigned: int) -> bool:
+        """Backtracks with inference, undoing the pruning through the trail.
+
+        Returns:
+            True if self.values holds a solution, otherwise False
+        """
+        self.backtrack_called += 1
+
+        # we have a solution when all variables are assigned
+        if unassigned == 0:
+            return True
+
+        index = self.select_variable()
+
+        for value in self.order_values(index):
+            mark = len(self.trail)
 
-                    # there was a result (not {})
-                    if result:
-                        return result
+            if self.assign_propagating(index, value) and self.backtrack_propagating(
+                unassigned - 1
+            ):
+                return True
 
-                    # no result, remove assignment (backtrack)
-                    self.backtrack_failures += 1
-                    del assignment[var]
+            # no result, remove assignment and its pruning (backtrack)
+            self.undo(mark)
+            self.unassign_propagating(index)
 
-            return {}
+            if self.restarting:
+                return False
+
+            self.backtrack_failures += 1
+
+            if self.backtrack_failures >= self.failure_limit:
+                self.restarting = True
+                return False
+
+        return False
+
+    def search_propagating(self, assignment: dict[str, Any]) -> bool:
+        """Sets up the current domains, the trail and the candidates, and
+        runs backtrack_propagating from assignment."""
+        variables = len(self.variables)
+        self.values = [UNASSIGNED] * variables
+        self.trail = []
+
+        if not self.bitmask:
+            self.current = [set(self.domains[variable]) for variable in self.variables]
+
+        self.remaining = [self.current_size(index) for index in range(variables)]
+        self.weights = [1 + len(neighbors) for neighbors in self.adjacency]
+        self.heaviest = max(self.weights, default=1)
+        self.tiebreak = list(range(variables))
+        self.failure_limit = math.inf
+        self.restarting = False
+        self.unassigned_degree = [len(neighbors) for neighbors in self.adjacency]
+        self.candidates = [set() for _ in range(max(self.remaining, default=0) + 1)]
+
+        for index, remaining in enumerate(self.remaining):
+            self.candidates[remaining].add(index)
+
+        for variable, value in assignment.items():
+            if not self.assign_propagating(self.index[variable], value):
+                return False
+
+        # MAC starts from an arc consistent state
+        if self.inference == "mac" and not self.propagate(
+            deque(
+                (i, j)
+                for i in range(variables)
+                if self.values[i] is UNASSIGNED
+                for j in self.adjacency[i]
+            ),
+            set(range(len(self.alldiffs))),
+        ):
+            return False
+
+        unassigned = variables - len(assignment)
+
+        if self.variable_order != "domwdeg":
+            return self.backtrack_propagating(unassigned)
+
+        # dom/wdeg keeps the weights it learned when it restarts, which sends
+        # it down another path, and breaks ties in a new random order too
+        rng = random.Random(0)
+        failures = RESTART_FAILURES
+
+        while True:
+            self.failure_limit = self.backtrack_failures + failures
+
+            if self.backtrack_propagating(unassigned):
+                return True
+
+            if not self.restarting:
+                return False
 
-    def backtracking_search(self) -> None | dict[str, Any]:
+            # every level has undone its assignment on the way up
+            self.restarting = False
+            rng.shuffle(self.tiebreak)
+            failures = int(failures * RESTART_GROWTH)
+
+    def backtrack(self, assignment: dict[str, Any]) -> dict[str, Any]:
+        """The recursive backtracking function."""
+        if self.inference != "none":
+            snapshot = self.snapshot()
+            solved = self.search_propagating(assignment)
+
+            # the bitmask domains are the search's current domains
+            self.restore(snapshot)
+
+            if not solved:
+                return {}
+        elif self.variable_order == "static" and self.value_order == "static":
+            self.values = [
+                assignment.get(variable, UNASSIGNED) for variable in self.variables
+            ]
+
+            if not self.backtrack_index(0):
+                return {}
+        else:
+            variables = len(self.variables)
+            self.values = [UNASSIGNED] * variables
+            self.conflicts = [
+                dict.fromkeys(self.domain_values(index), 0)
+                for index in range(variables)
+            ]
+            self.remaining = [len(conflicts) for conflicts in self.conflicts]
+            self.weights = [1 + len(neighbors) for neighbors in self.adjacency]
+            self.heaviest = max(self.weights, default=1)
+            self.tiebreak = list(range(variables))
+            self.unassigned_degree = [len(neighbors) for neighbors in self.adjacency]
+            self.candidates = [set() for _ in range(max(self.remaining, default=0) + 1)]
+
+            for index, remaining in enumerate(self.remaining):
+                self.candidates[remaining].add(index)
+
+            for variable, value in assignment.items():
+                self.assign(self.index[variable], value)
+
+            if not self.backtrack_ordered(variables - len(assignment)):
+                return {}
+
+        assignment.update(zip(self.variables, self.values))
+        return assignment
+
+    def backtracking_search(
+        self,
+        variable_order: str = "static",
+        value_order: str = "static",
+        inference: str = "none",
+    ) -> None | dict[str, Any]:
         """Performs backtracking search on the CSP.
 
+        Args:
+            variable_order: "static" to assign the variables in the order of
+                self.variables, "mrv" to pick the variable with the fewest
+                values that no assigned neighbor has, breaking ties by the
+                number of unassigned neighbors, or "domwdeg" to divide the
+                values by a weight that starts at the number of neighbors
+                and grows with every domain wipeout the variable is in,
+                restarting with inference after a growing number of failures
+            value_order: "static" to try values in the order of the domain,
+                or "lcv" to try the values that rule out the fewest values of
+                the unassigned neighbors first
+            inference: "none" to only check values against the assigned
+                neighbors, "forward_checking" to also remove the values of
+                unassigned neighbors that conflict with each assignment, or
+                "mac" to keep all domains arc consistent after each one
+
         Returns:
             A solution if any exists, otherwise None
         """
+        if variable_order not in VARIABLE_ORDERS:
+            raise ValueError(f"Unknown variable order {variable_order}")
+
+        if value_order not in VALUE_ORDERS:
+            raise ValueError(f"Unknown value order {value_order}")
+
+        if inference not in INFERENCES:
+            raise ValueError(f"Unknown inference {inference}")
+
+        self.variable_order = variable_order
+        self.value_order = value_order
+        self.inference = inference
+
         return self.backtrack({})
 
 
@@ -18,9 +18,10 @@ csp = CSP(
         ("Q", "NSW"),
         ("NSW", "V"),
     ],
+    bitmask=True,
 )
 
 print(csp.backtracking_search())
 
 # Example output after implementing csp.backtracking_search():
-# {'WA': 'red', 'NT': 'green', 'Q': 'red', 'NSW': 'green', 'V': 'red', 'SA': 'blue', 'T': 'red'}
+# {'WA': 'blue', 'NT': 'green', 'Q': 'blue', 'NSW': 'green', 'V': 'blue', 'SA': 'red', 'T': 'blue'}
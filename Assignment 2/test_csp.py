@@ -1,8 +1,56 @@
+import pytest
+
 from csp import CSP, alldiff
+import sudoku
 
 csp = None
 
 
+def sudoku_csp(bitmask: bool = False, global_alldiff: bool = False) -> CSP:
+    grid = open("sudoku_medium.txt").read().split()
+
+    WIDTH = 9
+    BOX_WIDTH = 3
+    domains = {}
+
+    for row in range(WIDTH):
+        for col in range(WIDTH):
+            if grid[row][col] == "0":
+                domains[f"X{row+1}{col+1}"] = set(range(1, 10))
+            else:
+                domains[f"X{row+1}{col+1}"] = {int(grid[row][col])}
+
+    groups = []
+
+    for row in range(WIDTH):
+        groups.append([f"X{row+1}{col+1}" for col in range(WIDTH)])
+
+    for col in range(WIDTH):
+        groups.append([f"X{row+1}{col+1}" for row in range(WIDTH)])
+
+    for box_row in range(BOX_WIDTH):
+        for box_col in range(BOX_WIDTH):
+            groups.append(
+                [
+                    f"X{row+1}{col+1}"
+                    for row in range(box_row * BOX_WIDTH, (box_row + 1) * BOX_WIDTH)
+                    for col in range(box_col * BOX_WIDTH, (box_col + 1) * BOX_WIDTH)
+                ]
+            )
+
+    return CSP(
+        variables=[f"X{row+1}{col+1}" for row in range(WIDTH) for col in range(WIDTH)],
+        domains=domains,
+        edges=(
+            []
+            if global_alldiff
+            else [edge for group in groups for edge in alldiff(group)]
+        ),
+        bitmask=bitmask,
+        alldiffs=groups if global_alldiff else None,
+    )
+
+
 def test_initialization():
     grid = open("sudoku_medium.txt").read().split()
 
@@ -122,3 +170,295 @@ def test_get_row():
         "X18",
         "X19",
     ]
+
+
+def map_coloring_csp(domains: dict[str, set], bitmask: bool = False) -> CSP:
+    variables = ["WA", "NT", "Q", "NSW", "V", "SA", "T"]
+
+    return CSP(
+        variables=variables,
+        domains={
+            variable: set(domains.get(variable, {"red", "green", "blue"}))
+            for variable in variables
+        },
+        edges=[
+            ("SA", "WA"),
+            ("SA", "NT"),
+            ("SA", "Q"),
+            ("SA", "NSW"),
+            ("SA", "V"),
+            ("WA", "NT"),
+            ("NT", "Q"),
+            ("Q", "NSW"),
+            ("NSW", "V"),
+        ],
+        bitmask=bitmask,
+    )
+
+
+def test_ac_3():
+    assert csp.ac_3()
+
+    # every value of every variable is supported by every neighbor
+    for variable in csp.variables:
+        for neighbor in csp.neighbors[variable]:
+            for value in csp.domains[variable]:
+                assert any(
+                    csp.satisfies(variable, value, neighbor, neighbor_value)
+                    for neighbor_value in csp.domains[neighbor]
+                )
+
+    # the arc consistent closure is unique, so it always has the same size
+    assert sum(len(domain) for domain in csp.domains.values()) == 118
+
+
+def test_ac_3_map_coloring():
+    map_csp = map_coloring_csp({"WA": {"red"}, "NT": {"green"}})
+
+    assert map_csp.ac_3()
+    assert map_csp.domains == {
+        "WA": {"red"},
+        "NT": {"green"},
+        "Q": {"red"},
+        "NSW": {"green"},
+        "V": {"red"},
+        "SA": {"blue"},
+        "T": {"red", "green", "blue"},
+    }
+
+    assert not map_coloring_csp({"WA": {"red"}, "NT": {"red"}}).ac_3()
+
+
+def test_backtracking_search():
+    solution = csp.backtracking_search()
+
+    assert set(solution) == set(csp.variables)
+    assert all(solution[a] != solution[b] for a, b in csp.binary_constraints)
+    assert all(solution[variable] in csp.domains[variable] for variable in solution)
+
+    map_csp = map_coloring_csp({})
+    map_solution = map_csp.backtracking_search()
+
+    assert all(
+        map_solution[a] != map_solution[b] for a, b in map_csp.binary_constraints
+    )
+    assert not map_csp.is_allowed("SA", map_solution["WA"], {"WA": map_solution["WA"]})
+    assert map_csp.is_allowed("T", map_solution["WA"], map_solution)
+
+
+def test_bitmask_domains():
+    bitmask_csp = sudoku_csp(bitmask=True)
+
+    assert bitmask_csp.value_table == list(range(1, 10))
+    assert bitmask_csp.domain_size("X11") == 9
+    assert bitmask_csp.domain_size("X15") == 1
+
+    snapshot = bitmask_csp.snapshot()
+
+    assert bitmask_csp.ac_3()
+    assert bitmask_csp.domains == csp.domains
+    assert bitmask_csp.backtracking_search() == csp.backtracking_search()
+
+    bitmask_csp.restore(snapshot)
+
+    assert bitmask_csp.domain_size("X11") == 9
+
+    map_csp = map_coloring_csp({"WA": {"red"}, "NT": {"green"}}, bitmask=True)
+
+    assert map_csp.ac_3()
+    assert map_csp.domains["SA"] == {"blue"}
+    assert set(map_csp.mask_values(map_csp.masks[map_csp.index["T"]])) == {
+        "red",
+        "green",
+        "blue",
+    }
+
+
+def test_variable_and_value_orders():
+    static_csp = sudoku_csp()
+    static_csp.ac_3()
+    static_solution = static_csp.backtracking_search()
+
+    for variable_order, value_order in [("mrv", "static"), ("mrv", "lcv")]:
+        ordered_csp = sudoku_csp()
+
+        assert (
+            ordered_csp.backtracking_search(variable_order, value_order)
+            == static_solution
+        )
+        assert ordered_csp.backtrack_called < static_csp.backtrack_called
+
+    map_csp = map_coloring_csp({"WA": {"red"}})
+    map_solution = map_csp.backtracking_search("mrv", "lcv")
+
+    assert map_solution["WA"] == "red"
+    assert all(
+        map_solution[a] != map_solution[b] for a, b in map_csp.binary_constraints
+    )
+
+    with pytest.raises(ValueError):
+        map_csp.backtracking_search("random")
+
+
+def test_inference():
+    for bitmask in (False, True):
+        plain_csp = sudoku_csp(bitmask)
+        solution = plain_csp.backtracking_search("mrv", "lcv")
+
+        for inference in ["forward_checking", "mac"]:
+            inference_csp = sudoku_csp(bitmask)
+            domains = {
+                variable: set(domain)
+                for variable, domain in inference_csp.domains.items()
+            }
+
+            assert (
+                inference_csp.backtracking_search("mrv", "lcv", inference) == solution
+            )
+            assert inference_csp.backtrack_failures <= plain_csp.backtrack_failures
+            assert inference_csp.domains == domains
+
+        static_csp = sudoku_csp(bitmask)
+        assert static_csp.backtracking_search(inference="mac") == solution
+
+    map_csp = map_coloring_csp({"WA": {"red"}, "SA": {"blue"}}, bitmask=True)
+    map_solution = map_csp.backtracking_search("mrv", "lcv", "mac")
+
+    assert map_solution["WA"] == "red" and map_solution["SA"] == "blue"
+    assert all(
+        map_solution[a] != map_solution[b] for a, b in map_csp.binary_constraints
+    )
+
+    with pytest.raises(ValueError):
+        map_csp.backtracking_search(inference="lookahead")
+
+
+def test_global_alldiff():
+    for bitmask in (False, True):
+        pairwise_csp = sudoku_csp(bitmask)
+        global_csp = sudoku_csp(bitmask, global_alldiff=True)
+
+        assert not pairwise_csp.satisfies("X11", 4, "X19", 4)
+        assert pairwise_csp.satisfies("X11", 4, "X19", 5)
+        assert pairwise_csp.satisfies("X11", 4, "X99", 4)
+        assert not global_csp.binary_constraints
+        assert global_csp.are_neighbors("X11", "X99") is False
+        assert global_csp.are_neighbors("X11", "X33")
+        assert not global_csp.satisfies("X11", 4, "X19", 4)
+        assert global_csp.satisfies("X11", 4, "X22", 5)
+
+        # matching prunes at least as much as the pairwise arcs
+        assert pairwise_csp.ac_3() and global_csp.ac_3()
+        assert all(
+            global_csp.domains[variable] <= pairwise_csp.domains[variable]
+            for variable in global_csp.variables
+        )
+
+        solution = pairwise_csp.backtracking_search("mrv", "lcv", "mac")
+
+        assert global_csp.backtracking_search("mrv", "lcv", "mac") == solution
+        assert global_csp.backtrack_failures <= pairwise_csp.backtrack_failures
+
+    # three variables can not differ with two values, which no arc reveals
+    variables = ["A", "B", "C"]
+
+    def domains(c_domain: set) -> dict[str, set]:
+        return {"A": {1, 2}, "B": {1, 2}, "C": set(c_domain)}
+
+    assert CSP(variables, domains({1, 2}), alldiff(variables)).ac_3()
+    assert not CSP(variables, domains({1, 2}), [], alldiffs=[variables]).ac_3()
+
+    # 1 and 2 are taken by A and B, so C must be 3
+    hidden_csp = CSP(
+        variables, domains({1, 2, 3}), [], bitmask=True, alldiffs=[variables]
+    )
+
+    assert hidden_csp.ac_3()
+    assert hidden_csp.domains["C"] == {3}
+
+
+def test_bulk_sudoku():
+    lines = [
+        "".join(open(problem).read().split())
+        for problem in [
+            "sudoku_easy.txt",
+            "sudoku_medium.txt",
+            "sudoku_hard.txt",
+            "sudoku_very_hard.txt",
+        ]
+    ]
+    lines[1] = lines[1].replace("0", ".")
+    lines += ["\n", "11" + "0" * 79, "123"]
+
+    results = list(sudoku.solve_stream(lines, workers=2, chunk_size=2))
+
+    # the blank line is skipped, and the rest keep their order
+    assert len(results) == 6
+    assert results[4] is not None and results[4][0] is None
+    assert results[5] is None
+
+    for line, result in zip(lines, results[:4]):
+        assert result is not None
+        solution, calls, latency = result
+        assert all(clue in "0." or clue == digit for clue, digit in zip(line, solution))
+        assert sudoku.sudoku_csp(sudoku.parse_grid(solution)).ac_3()
+        assert calls >= 82 and latency > 0
+
+    assert results[0] == sudoku.solve_line(lines[0])[:2] + (results[0][2],)
+
+    with pytest.raises(ValueError):
+        sudoku.parse_grid("123")
+
+
+def test_large_sudoku():
+    grid = sudoku.parse_grid(open("sudoku_16x16.txt").read())
+    large_csp = sudoku.sudoku_csp(grid)
+
+    assert len(grid) == 16 and grid[1][:6] == [0, 6, 0, 0, 4, 10]
+    assert list(large_csp.get_row("X1_1"))[-1] == "X1_16"
+    assert list(large_csp.get_column("X16_16"))[0] == "X1_16"
+    assert list(large_csp.get_subgrid("X4_4")) == [
+        f"X{row}_{col}"
+        for row in range(1, 5)
+        for col in range(1, 5)
+        if (row, col) != (4, 4)
+    ]
+
+    for variable_order in ["mrv", "domwdeg"]:
+        solution = sudoku.sudoku_csp(grid).backtracking_search(
+            variable_order, inference="mac"
+        )
+        solution_grid = [
+            [solution[sudoku.variable_name(row, col, 16)] for col in range(16)]
+            for row in range(16)
+        ]
+
+        assert sudoku.sudoku_csp(solution_grid).ac_3()
+        assert all(
+            grid[row][col] in (0, solution_grid[row][col])
+            for row in range(16)
+            for col in range(16)
+        )
+
+    # a 25x25 grid with every other cell empty, on one line
+    line = "".join(
+        "." if (row + col) % 2 else sudoku.SYMBOLS[(row % 5 * 5 + row // 5 + col) % 25]
+        for row in range(25)
+        for col in range(25)
+    )
+    solution, calls, _ = sudoku.solve_line(line)
+
+    assert all(clue in (".", symbol) for clue, symbol in zip(line, solution))
+    assert sudoku.sudoku_csp(sudoku.parse_grid(solution)).ac_3()
+    assert calls == 626
+
+    assert sudoku.parse_grid("1 0 0 4\n0 4 1 0\n4 1 0 0\n0 0 4 1") == [
+        [1, 0, 0, 4],
+        [0, 4, 1, 0],
+        [4, 1, 0, 0],
+        [0, 0, 4, 1],
+    ]
+
+    for text in ["1" * 36, "G" + "0" * 80]:
+        with pytest.raises(ValueError):
+            sudoku.parse_grid(text)
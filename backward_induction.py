@@ -0,0 +1,200 @@
+from array import array
+import time
+from typing import Any
+
+from search import Action, Game, State
+
+try:
+    import numpy as np
+except ImportError:  # solve falls back to a node by node reduction
+    np = None  # type: ignore[assignment]
+
+
+class CompiledTree:
+    def __init__(
+        self,
+        player: array,
+        first_child: array,
+        child_count: array,
+        utility: array,
+        levels: list[int],
+        actions: list[Action | None],
+    ):
+        """A finite game tree flattened into arrays, one entry per node.
+
+        The nodes are numbered breadth first, so the nodes of each ply are
+        contiguous and so are the children of each node, in the game's
+        order of the actions.
+
+        Args:
+            player: The player to move, or -1 at terminal nodes
+            first_child: The index of the first child
+            child_count: The number of children, 0 at terminal nodes
+            utility: P1's utility at terminal nodes, 0 elsewhere
+            levels: The index of the first node of each ply, followed by
+                the number of nodes
+            actions: The action leading to each node, None at the root
+        """
+        self.player = player
+        self.first_child = first_child
+        self.child_count = child_count
+        self.utility = utility
+        self.levels = levels
+        self.actions = actions
+
+    def __len__(self) -> int:
+        return len(self.player)
+
+
+def compile_game(game: Game, state: State) -> CompiledTree:
+    """Expands every state reachable from state into a CompiledTree.
+
+    Transpositions are expanded once per path, so the tree has exactly the
+    nodes a full minimax search without a table would visit.
+    """
+    player = array("b")
+    first_child = array("q")
+    child_count = array("q")
+    utility = array("d")
+    levels = [0]
+    actions: list[Action | None] = [None]
+
+    ply = [state]
+    next_index = 1
+
+    while ply:
+        next_ply = []
+
+        for state in ply:
+            first_child.append(next_index)
+
+            if game.is_terminal(state):
+                player.append(-1)
+                child_count.append(0)
+                utility.append(game.utility(state, 0))
+                continue
+
+            player.append(game.to_move(state))
+            utility.append(0)
+
+            state_actions = game.actions(state)
+            child_count.append(len(state_actions))
+            next_index += len(state_actions)
+
+            for action in state_actions:
+                next_ply.append(game.result(state, action))
+                actions.append(action)
+
+        levels.append(len(player))
+        ply = next_ply
+
+    return CompiledTree(player, first_child, child_count, utility, levels, actions)
+
+
+def solve(tree: CompiledTree) -> tuple[Any, Any]:
+    """Solves a compiled tree from the last ply back to the root.
+
+    With NumPy, every ply is reduced at once by segmented max and min over
+    the values of the next ply. Without it, the nodes are reduced one by one
+    in reverse order, which still avoids any recursion.
+
+    Returns:
+        P1's utility of every node under optimal play, and the index of the
+        first child with the best value for every node (-1 at terminal
+        nodes), as lists or NumPy arrays
+    """
+    if np is None:
+        return _solve_nodes(tree)
+
+    player = np.frombuffer(tree.player, dtype=np.int8)
+    first_child = np.frombuffer(tree.first_child, dtype=np.int64)
+    child_count = np.frombuffer(tree.child_count, dtype=np.int64)
+    values = np.array(tree.utility, dtype=np.float64)
+    best = np.full(len(tree), -1, dtype=np.int64)
+    levels = tree.levels
+
+    for ply in reversed(range(len(levels) - 2)):
+        start, end, children_end = levels[ply], levels[ply + 1], levels[ply + 2]
+        interior = start + np.flatnonzero(child_count[start:end])
+
+        if not len(interior):
+            continue
+
+        # the children of this ply's interior nodes are exactly the next ply
+        children = values[end:children_end]
+        offsets = first_child[interior] - end
+
+        node_values = np.where(
+            player[interior] == 0,
+            np.maximum.reduceat(children, offsets),
+            np.minimum.reduceat(children, offsets),
+        )
+        values[interior] = node_values
+
+        # the first child in each segment that has its parent's value
+        is_best = children == np.repeat(node_values, child_count[interior])
+        positions = np.where(is_best, np.arange(len(children)), len(children))
+        best[interior] = end + np.minimum.reduceat(positions, offsets)
+
+    return values, best
+
+
+def _solve_nodes(tree: CompiledTree) -> tuple[list[float], list[int]]:
+    values = list(tree.utility)
+    best = [-1] * len(tree)
+
+    # children always come after their parent
+    for node in range(len(tree) - 1, -1, -1):
+        count = tree.child_count[node]
+
+        if not count:
+            continue
+
+        first = tree.first_child[node]
+        children = values[first : first + count]
+        value = max(children) if tree.player[node] == 0 else min(children)
+
+        values[node] = value
+        best[node] = first + children.index(value)
+
+    return values, best
+
+
+def minimax_search(game: Game, state: State) -> Action | None:
+    """Compiles and solves the game from state instead of searching it.
+
+    Args:
+        game: A game whose tree from state is finite and fits in memory
+        state: The state to search from
+
+    Returns:
+        The best action, or None if the state is terminal
+    """
+    tree = compile_game(game, state)
+    _, best = solve(tree)
+
+    if best[0] < 0:
+        return None
+
+    return tree.actions[best[0]]
+
+
+if __name__ == "__main__":
+    import halving_game
+
+    for N in (16, 32, 64, 128):
+        game = halving_game.Game(N)
+
+        start_time = time.perf_counter()
+        tree = compile_game(game, game.initial_state())
+        compile_time = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        values, best = solve(tree)
+        solve_time = time.perf_counter() - start_time
+
+        print(
+            f"N={N}: {len(tree)} nodes, compiled in {compile_time:.3f}s, "
+            f"solved in {solve_time:.3f}s, P1's utility is {values[0]:g} "
+            f"and the best action is {tree.actions[best[0]]}"
+        )
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable
+
+import bucket_game
+import halving_game
+import tic_tac_toe
+from search import SearchStats, minimax_search
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "bench_baseline.json")
+
+# The metrics that can be compared against the baseline. Node counts are the
+# same on every machine, so only they are compared by default
+METRICS = ["time", "nodes", "peak_memory"]
+
+# Growth within these amounts (seconds, nodes and bytes) is noise, however
+# small the case is
+SLACK = {"time": 0.001, "nodes": 0, "peak_memory": 4096}
+
+
+def tic_tac_toe_case(*moves: tuple[int, int]) -> Callable[[], tuple[Any, Any]]:
+    def case() -> tuple[Any, Any]:
+        game = tic_tac_toe.Game()
+        state = game.initial_state()
+
+        for action in moves:
+            state = game.result(state, action)
+
+        return game, state
+
+    return case
+
+
+def halving_game_case(N: int) -> Callable[[], tuple[Any, Any]]:
+    def case() -> tuple[Any, Any]:
+        game = halving_game.Game(N)
+        return game, game.initial_state()
+
+    return case
+
+
+def bucket_game_case() -> tuple[Any, Any]:
+    game = bucket_game.Game()
+    return game, game.initial_state()
+
+
+CASES: dict[str, Callable[[], tuple[Any, Any]]] = {
+    "tic_tac_toe/empty": tic_tac_toe_case(),
+    "tic_tac_toe/corner": tic_tac_toe_case((0, 0)),
+    "tic_tac_toe/center": tic_tac_toe_case((1, 1)),
+    "tic_tac_toe/midgame": tic_tac_toe_case((1, 1), (0, 0), (0, 2)),
+    **{f"halving_game/{N}": halving_game_case(N) for N in (16, 32, 48, 64)},
+    "bucket_game/initial": bucket_game_case,
+}
+
+
+def run(case: Callable[[], tuple[Any, Any]], repeat: int) -> dict[str, float]:
+    """Benchmarks one case.
+
+    The wall time is the fastest of repeat searches. Nodes and peak memory
+    are measured by separate searches, so their bookkeeping does not slow
+    the timed ones down.
+    """
+    times = []
+
+    for _ in range(repeat):
+        game, state = case()
+        start_time = time.perf_counter()
+        minimax_search(game, state)
+        times.append(time.perf_counter() - start_time)
+
+    game, state = case()
+    stats = SearchStats()
+    minimax_search(game, state, stats=stats)
+
+    game, state = case()
+    tracemalloc.start()
+    minimax_search(game, state)
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"time": min(times), "nodes": stats.nodes, "peak_memory": peak_memory}
+
+
+def calibrate(repeat: int) -> float:
+    """Returns the fastest of repeat runs of a fixed workload that does not
+    use the search, to compare the speed of two machines with."""
+    times = []
+
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        sum(i * i for i in range(100_000))
+        times.append(time.perf_counter() - start_time)
+
+    return min(times)
+
+
+def regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    threshold: float,
+    metrics: list[str],
+    speed: float = 1.0,
+) -> list[str]:
+    """Returns a message for every metric that grew by more than threshold
+    (a fraction) over its baseline, plus its SLACK.
+
+    The baseline times are multiplied by speed, the time this machine takes
+    for the calibration workload over the time the baseline machine took.
+    """
+    messages = []
+
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        for metric in metrics:
+            old = baseline[name][metric] * (speed if metric == "time" else 1)
+            new = result[metric]
+
+            if new > old * (1 + threshold) + SLACK[metric]:
+                messages.append(f"{name}: {metric} regressed from {old:g} to {new:g}")
+
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks minimax_search on the games and compares the "
+        "results with a baseline file."
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.5,
+        help="fraction a metric may grow by before it counts as a regression",
+    )
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument(
+        "--update", action="store_true", help="write the results as the baseline"
+    )
+    parser.add_argument(
+        "--cases",
+        nargs="*",
+        choices=list(CASES),
+        default=None,
+        help="names of the cases to run",
+    )
+    parser.add_argument(
+        "--metrics",
+        nargs="+",
+        choices=METRICS,
+        default=["nodes"],
+        help="metrics to compare with the baseline, where times are scaled by "
+        "a calibration run to the speed of this machine",
+    )
+    args = parser.parse_args()
+
+    names = list(CASES) if args.cases is None else args.cases
+    results = {}
+    calibration = calibrate(args.repeat)
+
+    print(f"{'case':<24}{'time (ms)':>12}{'nodes':>10}{'peak memory':>14}")
+
+    for name in names:
+        result = results[name] = run(CASES[name], args.repeat)
+        print(
+            f"{name:<24}{result['time'] * 1000:>12.3f}{result['nodes']:>10}"
+            f"{result['peak_memory']:>14}"
+        )
+
+    if args.update:
+        with open(args.baseline, "w") as file:
+            json.dump({"calibration": calibration, "cases": results}, file, indent=4)
+            file.write("\n")
+
+        print(f"Wrote the baseline to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}, run with --update to create one")
+        return
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    messages = regressions(
+        results,
+        baseline["cases"],
+        args.threshold,
+        args.metrics,
+        calibration / baseline["calibration"],
+    )
+
+    for message in messages:
+        print(message, file=sys.stderr)
+
+    if messages:
+        sys.exit(1)
+
+    print(f"No regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,4 @@
-import math
+from search import Searcher, minimax_search
 
 State = tuple[int, list[str | int]]  # Tuple of player (whose turn it is),
 # and the buckets (as str)
@@ -55,64 +55,20 @@ class Game:
             print(f"it is P{self.to_move(state)+1}'s turn")
 
 
-def max_value(game: Game, state: State) -> float:
-    if game.is_terminal(state):
-        return game.utility(state, 0)
-
-    v = -math.inf
-
-    for action in game.actions(state):
-        result = game.result(state, action)
-        v = max(v, min_value(game, result))
-
-    assert v != -math.inf
-
-    return v
-
-
-def min_value(game: Game, state: State) -> float:
-    if game.is_terminal(state):
-        return game.utility(state, 0)
-
-    v = math.inf
-
-    for action in game.actions(state):
-        result = game.result(state, action)
-        v = min(v, max_value(game, result))
-
-    assert v != math.inf
-
-    return v
-
-
-def minimax_search(game: Game, state: State) -> Action | None:
-    best_action = None
-    best_value = -math.inf
-
-    for action in game.actions(state):
-        result = game.result(state, action)
-        v = min_value(game, result)
-
-        if v > best_value:
-            best_value = v
-            best_action = action
-
-    return best_action
-
-
 if __name__ == "__main__":
     game = Game()
 
     state = game.initial_state()
+    searcher = Searcher(game, state)
     game.print(state)
 
     while not game.is_terminal(state):
         player = game.to_move(state)
-        action = minimax_search(game, state)  # The player whose turn it is
+        action = searcher.search()  # The player whose turn it is
         # is the MAX player
         print(f"P{player+1}'s action: {action}")
 
         assert action is not None
 
-        state = game.result(state, action)
+        state = searcher.advance(action)
         game.print(state)
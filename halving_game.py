@@ -1,4 +1,6 @@
-import math
+from typing import Iterable
+
+import search
 
 State = tuple[int, int]  # Tuple of player (whose turn it is),
 # and the number to be decreased
@@ -18,7 +20,7 @@ class Game:
         return player
 
     @staticmethod
-    def actions() -> list[Action]:
+    def actions(state: State) -> list[Action]:
         return ["--", "/2"]
 
     @staticmethod
@@ -34,6 +36,15 @@ class Game:
         else:
             return (self.to_move(state) + 1) % 2, number // 2  # Floored division
 
+    @staticmethod
+    def zobrist_hash(state: State) -> int:
+        # the state packs into a collision-free key
+        player, number = state
+        return number << 1 | player
+
+    def zobrist_update(self, key: int, state: State, action: Action) -> int:
+        return self.zobrist_hash(self.result(state, action))
+
     def utility(self, state: State, player: int) -> float:
         assert self.is_terminal(state)
         return 1 if self.to_move(state) == player else -1
@@ -51,60 +62,99 @@ class Game:
             print(f"it is P{self.to_move(state)+1}'s turn")
 
 
-def max_value(game: Game, state: State) -> float:
-    if game.is_terminal(state):
-        return game.utility(state, 0)
+_FLIP = bytes.maketrans(b"\x00\x01", b"\x01\x00")
 
-    v = -math.inf
 
-    for action in game.actions():
-        result = game.result(state, action)
-        v = max(v, min_value(game, result))
+class Solver:
+    def __init__(self, N: int):
+        """Solves the game for every number from 0 to N, bottom-up.
+
+        wins[number] is 1 if the player whose turn it is wins from number,
+        otherwise 0. Both players can always move, so
+        wins[number] = not (wins[number - 1] and wins[number // 2]).
 
-    assert v != -math.inf
+        Unrolling that by induction, every odd number from 3 and up is a win,
+        which leaves wins[2m] = not wins[m] for m >= 2. The table is therefore
+        filled one power-of-two range at a time by slice assignments, in O(N)
+        time and one byte per number.
 
-    return v
+        Args:
+            N: The largest number that can be queried
+        """
+        self.N = N
+        self.wins = bytearray(N + 1)
+        self.wins[:3] = b"\x01\x00\x01"[: N + 1]
+        self.wins[3::2] = b"\x01" * len(range(3, N + 1, 2))
+
+        low = 2
+
+        while 2 * low <= N:
+            high = min(2 * low, N // 2 + 1)
+            self.wins[2 * low : 2 * high : 2] = self.wins[low:high].translate(_FLIP)
+            low = high
+
+    def value(self, state: State) -> int:
+        """Returns P1's utility of the state under optimal play."""
+        player, number = state
+        return 1 if self.wins[number] == (player == 0) else -1
+
+    def best_action(self, state: State) -> Action | None:
+        """Returns the same action as minimax_search: the first action that
+        leaves the opponent in a lost position, or the first action if none does.
+        """
+        _, number = state
 
+        if number == 0:
+            return None
 
-def min_value(game: Game, state: State) -> float:
-    if game.is_terminal(state):
-        return game.utility(state, 0)
+        if not self.wins[number - 1]:
+            return "--"
 
-    v = math.inf
+        if not self.wins[number // 2]:
+            return "/2"
 
-    for action in game.actions():
-        result = game.result(state, action)
-        v = min(v, max_value(game, result))
+        return "--"
 
-    assert v != math.inf
+    def best_actions(self, numbers: Iterable[int]) -> list[Action | None]:
+        """Returns P1's best action for each starting number."""
+        return [self.best_action((0, number)) for number in numbers]
 
-    return v
+    def winners(self, numbers: Iterable[int]) -> list[int]:
+        """Returns the player who wins from each starting number."""
+        wins = self.wins
+        return [0 if wins[number] else 1 for number in numbers]
 
 
-def minimax_search(game: Game, state: State) -> Action | None:
-    best_action = None
-    best_value = -math.inf
+def minimax_search(
+    game: Game, state: State, solver: Solver | None = None
+) -> Action | None:
+    """Returns the minimax action for the player whose turn it is.
 
-    for action in game.actions():
-        result = game.result(state, action)
-        v = min_value(game, result)
+    Args:
+        game: The game to search
+        state: The state to search from
+        solver: A Solver for at least game.N, to look the action up in
+            instead of searching
 
-        if v > best_value:
-            best_value = v
-            best_action = action
+    Returns:
+        The best action, or None if the state has no actions
+    """
+    if solver is None:
+        return search.minimax_search(game, state)
 
-    return best_action
+    return solver.best_action(state)
 
 
 if __name__ == "__main__":
     game = Game(5)
+    solver = Solver(game.N)
 
     state = game.initial_state()
     game.print(state)
 
     while not game.is_terminal(state):
         player = game.to_move(state)
-        action = minimax_search(game, state)  # The player whose turn it is
+        action = minimax_search(game, state, solver)  # The player whose turn it is
         # is the MAX player
         print(f"P{player+1}'s action: {action}")
 
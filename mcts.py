@@ -0,0 +1,265 @@
+from concurrent.futures import ProcessPoolExecutor
+import math
+import random
+import time
+from typing import Callable, Generic
+
+from search import A, Game, S
+
+RolloutPolicy = Callable[[Game[S, A], S, random.Random], A]
+
+
+def random_rollout(game: Game[S, A], state: S, rng: random.Random) -> A:
+    """Picks any action, which is the cheapest policy to play out games with."""
+    return rng.choice(game.actions(state))
+
+
+class Node(Generic[S, A]):
+    __slots__ = ("state", "parent", "action", "children", "untried", "visits", "total")
+
+    def __init__(
+        self,
+        game: Game[S, A],
+        state: S,
+        parent: "Node[S, A] | None" = None,
+        action: A | None = None,
+    ):
+        self.state = state
+        self.parent: Node[S, A] | None = parent
+        self.action: A | None = action  # The action that led here
+        self.children: list[Node[S, A]] = []
+        self.untried: list[A] = (
+            [] if game.is_terminal(state) else list(game.actions(state))
+        )
+        self.visits = 0
+        self.total = 0.0  # Sum of P1's utility over the playouts through here
+
+
+class MCTS(Generic[S, A]):
+    def __init__(
+        self,
+        game: Game[S, A],
+        iterations: int | None = 1000,
+        time_budget: float | None = None,
+        exploration: float = math.sqrt(2),
+        rollout: RolloutPolicy[S, A] = random_rollout,
+        seed: int | None = None,
+    ):
+        """Monte Carlo tree search with UCT over the shared Game interface.
+
+        The tree is kept between searches, so when the next search starts
+        from a state that is already in the tree, up to two plies below the
+        last root, its playouts are reused.
+
+        Args:
+            game: The game to search
+            iterations: Playouts per search, or None for no limit
+            time_budget: Seconds per search, or None for no limit
+            exploration: The UCT exploration constant, applied to utilities
+                scaled to [0, 1] by the range seen so far
+            rollout: Picks the actions of the playouts
+            seed: Seed for the playouts
+        """
+        assert iterations is not None or time_budget is not None
+
+        self.game = game
+        self.iterations = iterations
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.rollout = rollout
+        self.rng = random.Random(seed)
+
+        self.root: Node[S, A] | None = None
+        self.low = math.inf  # The lowest and highest utility seen so far
+        self.high = -math.inf
+        self.playouts = 0
+
+    def find_root(self, state: S) -> Node[S, A]:
+        """Returns the node of the state from the old tree, or a new one."""
+        root = self.root
+        candidates = [] if root is None else [root] + root.children
+
+        if root is not None:
+            candidates += [node for child in root.children for node in child.children]
+
+        for node in candidates:
+            if node.state == state:
+                node.parent = None
+                return node
+
+        return Node(self.game, state)
+
+    def advance(self, action: A) -> None:
+        """Moves the root of the kept tree to the child reached by action."""
+        if self.root is None:
+            return
+
+        for child in self.root.children:
+            if child.action == action:
+                child.parent = None
+                self.root = child
+                return
+
+        self.root = Node(self.game, self.game.result(self.root.state, action))
+
+    def score(self, child: Node[S, A], maximizing: bool, log_visits: float) -> float:
+        mean = child.total / child.visits
+        spread = self.high - self.low
+        exploitation = (mean - self.low) / spread if spread > 0 else 0.5
+
+        if not maximizing:
+            exploitation = 1 - exploitation
+
+        return exploitation + self.exploration * math.sqrt(log_visits / child.visits)
+
+    def playout(self, root: Node[S, A]) -> None:
+        game = self.game
+        node = root
+
+        # selection: follow the best UCT score down to a node with untried actions
+        while not node.untried and node.children:
+            maximizing = game.to_move(node.state) == 0
+            log_visits = math.log(node.visits)
+            node = max(
+                node.children,
+                key=lambda child: self.score(child, maximizing, log_visits),
+            )
+
+        # expansion
+        if node.untried:
+            action = node.untried.pop()
+            child = Node(game, game.result(node.state, action), node, action)
+            node.children.append(child)
+            node = child
+
+        # simulation
+        state = node.state
+
+        while not game.is_terminal(state):
+            state = game.result(state, self.rollout(game, state, self.rng))
+
+        utility = game.utility(state, 0)
+        self.low = min(self.low, utility)
+        self.high = max(self.high, utility)
+
+        # backpropagation
+        ancestor: Node[S, A] | None = node
+
+        while ancestor is not None:
+            ancestor.visits += 1
+            ancestor.total += utility
+            ancestor = ancestor.parent
+
+        self.playouts += 1
+
+    def visits(self, state: S) -> dict[A, int]:
+        """Runs the playouts for the state and returns the visits of each action."""
+        root = self.root = self.find_root(state)
+        self.rng.shuffle(root.untried)
+
+        deadline = (
+            None if self.time_budget is None else time.perf_counter() + self.time_budget
+        )
+        iteration = 0
+
+        while self.iterations is None or iteration < self.iterations:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+            self.playout(root)
+            iteration += 1
+
+        # only the root has no action
+        return {
+            child.action: child.visits
+            for child in root.children
+            if child.action is not None
+        }
+
+    def search(self, state: S) -> A | None:
+        """Returns the most visited action, the first in the game's order on ties."""
+        return _most_visited(self.game, state, self.visits(state))
+
+
+def _most_visited(game: Game[S, A], state: S, visits: dict[A, int]) -> A | None:
+    if game.is_terminal(state):
+        return None
+
+    actions = game.actions(state)
+
+    return max(
+        actions, key=lambda action: (visits.get(action, 0), -actions.index(action))
+    )
+
+
+def _root_visits(
+    game: Game[S, A],
+    state: S,
+    iterations: int | None,
+    time_budget: float | None,
+    seed: int,
+) -> dict[A, int]:
+    return MCTS(game, iterations, time_budget, seed=seed).visits(state)
+
+
+def mcts_search(
+    game: Game[S, A],
+    state: S,
+    iterations: int | None = 1000,
+    time_budget: float | None = None,
+    workers: int | None = None,
+    seed: int | None = None,
+) -> A | None:
+    """Returns the action Monte Carlo tree search visits the most.
+
+    Args:
+        game: The game to search
+        state: The state to search from
+        iterations: Playouts per process, or None for no limit
+        time_budget: Seconds to search for, or None for no limit
+        workers: The number of processes to grow independent trees in, whose
+            root visits are added up, or None to search in this process
+        seed: Seed for the playouts
+
+    Returns:
+        The best action, or None if the state is terminal
+    """
+    if workers is None:
+        return MCTS(game, iterations, time_budget, seed=seed).search(state)
+
+    seeds = random.Random(seed).sample(range(1 << 30), workers)
+    visits: dict[A, int] = {}
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(_root_visits, game, state, iterations, time_budget, seed)
+            for seed in seeds
+        ]
+
+        for future in futures:
+            for action, count in future.result().items():
+                visits[action] = visits.get(action, 0) + count
+
+    return _most_visited(game, state, visits)
+
+
+if __name__ == "__main__":
+    import mnk_game
+
+    game = mnk_game.Game(rows=6, columns=7, k=4, gravity=True)
+    players = [
+        MCTS(game, iterations=None, time_budget=1.0, seed=player) for player in range(2)
+    ]
+
+    state = game.initial_state()
+    game.print(state)
+
+    while not game.is_terminal(state):
+        player = game.to_move(state)
+        action = players[player].search(state)  # Each player keeps its own tree
+        print(f"P{player+1}'s action: {action}")
+
+        assert action is not None
+
+        state = game.result(state, action)
+        game.print(state)
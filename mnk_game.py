@@ -0,0 +1,247 @@
+import math
+import random
+
+from search import Searcher, TranspositionTable
+
+State = tuple[int, list[list[int | None]], float]  # Tuple of player (whose turn
+# it is), board, and P1's threat score (infinite once a player has k in a row)
+Action = tuple[int, int]  # Where to place the player's piece
+
+# The threat score shrinks into (-1, 1) by dividing it by its size plus this,
+# so that evaluations never outweigh a win
+EVALUATION_SCALE = 100
+
+
+class Game:
+    def __init__(
+        self, rows: int = 3, columns: int = 3, k: int = 3, gravity: bool = False
+    ):
+        """An m,n,k game: players take turns placing pieces on a rows x columns
+        board, and the first to get k in a row, column or diagonal wins.
+
+        Args:
+            rows: The height of the board
+            columns: The width of the board
+            k: How many pieces in a row win
+            gravity: Whether pieces fall to the lowest empty row of their column,
+                as in connect four (rows=6, columns=7, k=4)
+        """
+        self.rows = rows
+        self.columns = columns
+        self.k = k
+        self.gravity = gravity
+
+        # every line of k cells, and the lines through each cell,
+        # where a cell is numbered row * columns + col
+        self.lines: list[tuple[int, ...]] = []
+        self.cell_lines: list[list[int]] = [[] for _ in range(rows * columns)]
+
+        for row in range(rows):
+            for col in range(columns):
+                for row_step, col_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+                    end_row = row + (k - 1) * row_step
+                    end_col = col + (k - 1) * col_step
+
+                    if not (0 <= end_row < rows and 0 <= end_col < columns):
+                        continue
+
+                    line = tuple(
+                        (row + i * row_step) * columns + col + i * col_step
+                        for i in range(k)
+                    )
+
+                    for cell in line:
+                        self.cell_lines[cell].append(len(self.lines))
+
+                    self.lines.append(line)
+
+        # a line with only one player's pieces is worth more the more it has
+        self.weights = [0] + [4 ** (count - 1) for count in range(1, k)]
+
+        # central cells take part in the most lines, so they are tried first
+        self.cell_order = sorted(
+            range(rows * columns),
+            key=lambda cell: -len(self.cell_lines[cell]),
+        )
+        self.column_order = sorted(
+            range(columns), key=lambda col: abs(2 * col - (columns - 1))
+        )
+
+        zobrist_random = random.Random(4136)
+        self.zobrist_pieces = [
+            [zobrist_random.getrandbits(64) for _ in range(rows * columns)]
+            for player in range(2)
+        ]
+        self.zobrist_to_move = zobrist_random.getrandbits(64)
+
+    def initial_state(self) -> State:
+        return 0, [[None] * self.columns for _ in range(self.rows)], 0
+
+    @staticmethod
+    def to_move(state: State) -> int:
+        return state[0]
+
+    def actions(self, state: State) -> list[Action]:
+        _, board, _ = state
+        actions = []
+
+        if self.gravity:
+            for col in self.column_order:
+                for row in range(self.rows - 1, -1, -1):
+                    if board[row][col] is None:
+                        actions.append((row, col))
+                        break
+
+            return actions
+
+        for cell in self.cell_order:
+            row, col = divmod(cell, self.columns)
+
+            if board[row][col] is None:
+                actions.append((row, col))
+
+        return actions
+
+    @staticmethod
+    def is_winner(state: State, player: int) -> bool:
+        return state[2] == (math.inf if player == 0 else -math.inf)
+
+    def line_score(self, x_count: int, o_count: int) -> float:
+        if x_count and o_count:
+            return 0
+
+        if x_count:
+            return math.inf if x_count == self.k else self.weights[x_count]
+
+        if o_count:
+            return -math.inf if o_count == self.k else -self.weights[o_count]
+
+        return 0
+
+    def result(self, state: State, action: Action) -> State:
+        player_index, board, score = state
+        row, col = action
+        columns = self.columns
+
+        # only the lines through the new piece change their score
+        for line in self.cell_lines[row * columns + col]:
+            x_count = o_count = 0
+
+            for cell in self.lines[line]:
+                piece = board[cell // columns][cell % columns]
+
+                if piece == 0:
+                    x_count += 1
+                elif piece == 1:
+                    o_count += 1
+
+            score -= self.line_score(x_count, o_count)
+
+            if player_index == 0:
+                x_count += 1
+            else:
+                o_count += 1
+
+            line_score = self.line_score(x_count, o_count)
+
+            if math.isinf(line_score):
+                score = line_score
+                break
+
+            score += line_score
+
+        next_board = [board_row[:] for board_row in board]
+        next_board[row][col] = player_index
+
+        return (player_index + 1) % 2, next_board, score
+
+    def is_terminal(self, state: State) -> bool:
+        _, board, score = state
+        return math.isinf(score) or not any(None in row for row in board)
+
+    def utility(self, state: State, player: int) -> int:
+        assert self.is_terminal(state)
+
+        if self.is_winner(state, player):
+            return 1
+
+        if self.is_winner(state, (player + 1) % 2):
+            return -1
+
+        return 0
+
+    @staticmethod
+    def evaluate(state: State) -> float:
+        """Estimates P1's utility of a non-terminal state from its threat score."""
+        score = state[2]
+        return score / (abs(score) + EVALUATION_SCALE)
+
+    def zobrist_hash(self, state: State) -> int:
+        player_index, board, _ = state
+        key = self.zobrist_to_move if player_index == 1 else 0
+
+        for row in range(self.rows):
+            for col in range(self.columns):
+                piece = board[row][col]
+
+                if piece is not None:
+                    key ^= self.zobrist_pieces[piece][row * self.columns + col]
+
+        return key
+
+    def zobrist_update(self, key: int, state: State, action: Action) -> int:
+        row, col = action
+        piece = self.zobrist_pieces[state[0]][row * self.columns + col]
+        return key ^ piece ^ self.zobrist_to_move
+
+    def print(self, state: State) -> None:
+        _, board, _ = state
+
+        print()
+
+        for row in range(self.rows):
+            cells = [
+                " " if board[row][col] is None else "x" if board[row][col] == 0 else "o"
+                for col in range(self.columns)
+            ]
+
+            print(" " + " | ".join(cells))
+
+            if row < self.rows - 1:
+                print("+".join(["---"] * self.columns))
+
+        print()
+
+        if self.is_terminal(state):
+            if self.utility(state, 0) > 0:
+                print("P1 won")
+            elif self.utility(state, 1) > 0:
+                print("P2 won")
+            else:
+                print("The game is a draw")
+        else:
+            print(f"It is P{self.to_move(state)+1}'s turn to move")
+
+
+if __name__ == "__main__":
+    game = Game(rows=6, columns=7, k=4, gravity=True)
+
+    state = game.initial_state()
+    searcher = Searcher(
+        game,
+        state,
+        table=TranspositionTable(1 << 18),
+        time_budget=1.0,
+        evaluate=game.evaluate,
+    )
+    game.print(state)
+
+    while not game.is_terminal(state):
+        player = game.to_move(state)
+        action = searcher.search()  # The player whose turn it is is the MAX player
+        print(f"P{player+1}'s action: {action}")
+
+        assert action is not None
+
+        state = searcher.advance(action)
+        game.print(state)
@@ -0,0 +1,400 @@
+import argparse
+import asyncio
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+import json
+import random
+import sys
+from statistics import quantiles
+import time
+from typing import Any, Sequence
+
+from search import TranspositionTable, minimax_search
+from tic_tac_toe import (
+    FULL_BOARD,
+    Action,
+    BitboardGame,
+    BitState,
+    Game,
+    has_line,
+    to_bitboard,
+)
+
+# The protocol is one JSON object per line in each direction. A client sends
+#   {"id": 1, "state": [player, board]}
+# where board is 3 rows of 3 cells that are null, 0 (P1's piece) or 1 (P2's),
+# and gets back {"id": 1, "action": [row, col]}, or {"id": 1, "error": "..."}
+# if the state is invalid or terminal. {"id": 2, "stats": true} returns the
+# server's counters and latencies instead. Responses may come back in any
+# order, so clients match them up by id.
+
+_worker_game: BitboardGame | None = None
+_worker_table: TranspositionTable | None = None
+
+
+def _init_worker(table_size: int) -> None:
+    global _worker_game, _worker_table
+    _worker_game = BitboardGame()
+    _worker_table = TranspositionTable(table_size)
+
+
+def _search(state: BitState) -> Action | None:
+    assert _worker_game is not None
+    return minimax_search(_worker_game, state, table=_worker_table)
+
+
+class MoveCache:
+    def __init__(self, size: int):
+        """A size-bounded map from states to their best actions.
+
+        When the cache is full, the least recently used entry is evicted.
+        """
+        self.size = size
+        self.entries: OrderedDict[BitState, Action | None] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, state: BitState) -> bool:
+        return state in self.entries
+
+    def get(self, state: BitState) -> Action | None:
+        self.entries.move_to_end(state)
+        return self.entries[state]
+
+    def store(self, state: BitState, action: Action | None) -> None:
+        self.entries[state] = action
+        self.entries.move_to_end(state)
+
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+
+def request_id(line: bytes) -> Any:
+    """Returns the id of a request, or None if it has none."""
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return None
+
+    return request.get("id") if isinstance(request, dict) else None
+
+
+def percentiles(values: Sequence[float]) -> list[float]:
+    """Returns the 1st to 99th percentiles of values."""
+    if len(values) < 2:
+        return list(values or [0.0]) * 99
+
+    return quantiles(values, n=100, method="inclusive")
+
+
+def parse_state(state: Any) -> BitState:
+    """Turns the state of a request into a bitboard, or raises ValueError."""
+    try:
+        player_index, board = state
+        # JSON numbers such as 1.0 and true compare equal to 1 but are not
+        # valid players or pieces
+        valid = (
+            type(player_index) is int
+            and player_index in (0, 1)
+            and len(board) == 3
+            and all(len(row) == 3 for row in board)
+            and all(
+                cell is None or type(cell) is int and cell in (0, 1)
+                for row in board
+                for cell in row
+            )
+        )
+    except (TypeError, ValueError):
+        valid = False
+
+    if not valid:
+        raise ValueError("state must be [player, board] with a 3x3 board")
+
+    bit_state = to_bitboard((player_index, board))
+    _, x_bits, o_bits = bit_state
+
+    # P1 moves first, so the pieces decide whose turn it is
+    if x_bits.bit_count() - o_bits.bit_count() != player_index:
+        raise ValueError("state can not be reached from the initial state")
+
+    if has_line(x_bits) or has_line(o_bits) or x_bits | o_bits == FULL_BOARD:
+        raise ValueError("state is terminal")
+
+    return bit_state
+
+
+class MoveServer:
+    def __init__(self, workers: int | None = None, cache_size: int = 1 << 14):
+        """Answers tic-tac-toe move requests from many clients at once.
+
+        Searches run in a pool of worker processes. Concurrent requests for
+        the same state share one search, and finished searches are kept in a
+        cache shared by all clients.
+
+        Args:
+            workers: The number of worker processes, by default one per CPU
+            cache_size: The maximum number of states in the cache
+        """
+        self.pool = ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(1 << 16,)
+        )
+        self.cache = MoveCache(cache_size)
+        self.pending: dict[BitState, asyncio.Future] = {}
+
+        self.requests = 0
+        self.searches = 0
+        self.coalesced = 0
+        self.latencies: deque[float] = deque(maxlen=100_000)  # The most recent
+        self.start_time = time.perf_counter()
+
+    async def best_action(self, state: BitState) -> Action | None:
+        if state in self.cache:
+            self.cache.hits += 1
+            return self.cache.get(state)
+
+        self.cache.misses += 1
+
+        if state in self.pending:
+            self.coalesced += 1
+            return await asyncio.shield(self.pending[state])
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self.pool, _search, state)
+        self.pending[state] = future
+        self.searches += 1
+
+        try:
+            action = await asyncio.shield(future)
+        finally:
+            del self.pending[state]
+
+        self.cache.store(state, action)
+        return action
+
+    def stats(self) -> dict[str, Any]:
+        elapsed = time.perf_counter() - self.start_time
+        p = percentiles(self.latencies)
+
+        return {
+            "requests": self.requests,
+            "searches": self.searches,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache.hits,
+            "cache_misses": self.cache.misses,
+            "cache_size": len(self.cache.entries),
+            "requests_per_second": self.requests / elapsed if elapsed else 0.0,
+            "p50_ms": p[49] * 1000,
+            "p99_ms": p[98] * 1000,
+        }
+
+    async def respond(self, line: bytes) -> dict[str, Any]:
+        start_time = time.perf_counter()
+
+        try:
+            request = json.loads(line)
+        except ValueError:  # Also raised for bytes that are not UTF-8
+            return {"id": None, "error": "request is not JSON"}
+
+        if not isinstance(request, dict):
+            return {"id": None, "error": "request is not a JSON object"}
+
+        response: dict[str, Any] = {"id": request.get("id")}
+
+        if request.get("stats"):
+            response["stats"] = self.stats()
+            return response
+
+        try:
+            state = parse_state(request.get("state"))
+        except ValueError as error:
+            response["error"] = str(error)
+            return response
+
+        action = await self.best_action(state)
+        response["action"] = None if action is None else list(action)
+
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - start_time)
+
+        return response
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serves one connection, answering its requests as they finish."""
+        tasks: set[asyncio.Task] = set()
+
+        async def answer(line: bytes) -> None:
+            # every request gets a response, or its client would wait forever
+            try:
+                response = await self.respond(line)
+            except Exception as error:
+                response = {"id": request_id(line), "error": f"internal error: {error}"}
+
+            writer.write(json.dumps(response).encode() + b"\n")
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+
+                task = asyncio.create_task(answer(line))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.CancelledError):
+            # the server shutting down cancels the connections still open
+            for task in tasks:
+                task.cancel()
+        finally:
+            writer.close()
+
+    async def serve(
+        self, host: str = "127.0.0.1", port: int = 8765, path: str | None = None
+    ) -> asyncio.Server:
+        """Starts listening on a Unix socket at path if given, else over TCP."""
+        if path is not None:
+            return await asyncio.start_unix_server(self.handle, path)
+
+        return await asyncio.start_server(self.handle, host, port)
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+
+def reachable_states(count: int, seed: int) -> list[Any]:
+    """Returns count random non-terminal states, in the protocol's format."""
+    game = Game()
+    rng = random.Random(seed)
+    states: list[Any] = []
+
+    while len(states) < count:
+        state = game.initial_state()
+
+        for _ in range(rng.randrange(9)):
+            state = game.result(state, rng.choice(game.actions(state)))
+
+            if game.is_terminal(state):
+                break
+
+        if not game.is_terminal(state):
+            states.append(list(state))
+
+    return states
+
+
+async def connect(
+    host: str, port: int, path: str | None
+) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    if path is not None:
+        return await asyncio.open_unix_connection(path)
+
+    return await asyncio.open_connection(host, port)
+
+
+async def load(
+    host: str,
+    port: int,
+    path: str | None,
+    clients: int,
+    requests: int,
+    seed: int,
+) -> dict[str, Any]:
+    """Runs clients that each send requests one at a time, and returns the
+    latencies they measured along with the server's stats."""
+    states = reachable_states(1000, seed)
+    latencies: list[float] = []
+
+    async def client(index: int) -> None:
+        reader, writer = await connect(host, port, path)
+        rng = random.Random(seed + index)
+
+        for request_id in range(requests):
+            start_time = time.perf_counter()
+            request = {"id": request_id, "state": rng.choice(states)}
+            writer.write(json.dumps(request).encode() + b"\n")
+            await writer.drain()
+
+            response = json.loads(await reader.readline())
+            assert response["id"] == request_id and "action" in response, response
+            latencies.append(time.perf_counter() - start_time)
+
+        writer.close()
+        await writer.wait_closed()
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(client(index) for index in range(clients)))
+    elapsed = time.perf_counter() - start_time
+
+    reader, writer = await connect(host, port, path)
+    writer.write(json.dumps({"id": 0, "stats": True}).encode() + b"\n")
+    await writer.drain()
+    server_stats = json.loads(await reader.readline())["stats"]
+    writer.close()
+    await writer.wait_closed()
+
+    p = percentiles(latencies)
+
+    return {
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": p[49] * 1000,
+        "p99_ms": p[98] * 1000,
+        "server": server_stats,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serves tic-tac-toe moves as line-delimited JSON, or "
+        "generates load against such a server."
+    )
+    parser.add_argument(
+        "mode",
+        choices=["serve", "load", "bench"],
+        help="bench starts a server and runs the load generator against it",
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Unix socket path to use")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--cache-size", type=int, default=1 << 14)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=100, help="per client")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == "load":
+        report = await load(
+            args.host, args.port, args.unix, args.clients, args.requests, args.seed
+        )
+        print(json.dumps(report, indent=4))
+        return
+
+    server = MoveServer(args.workers, args.cache_size)
+    listener = await server.serve(args.host, args.port, args.unix)
+
+    try:
+        if args.mode == "serve":
+            address = args.unix or f"{args.host}:{args.port}"
+            print(f"Serving on {address}", file=sys.stderr)
+            await listener.serve_forever()
+        else:
+            report = await load(
+                args.host, args.port, args.unix, args.clients, args.requests, args.seed
+            )
+            print(json.dumps(report, indent=4))
+    finally:
+        listener.close()
+        await listener.wait_closed()
+        server.close()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,1254 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+import json
+import math
+import multiprocessing
+import os
+import time
+from typing import Any, Callable, Generic, Hashable, Protocol, TypeVar, cast
+
+State = Any  # Whatever the game module uses as its state
+Action = Hashable  # Actions must be hashable so they can be remembered
+
+S = TypeVar("S")  # The state type of a particular game
+A = TypeVar("A", bound=Hashable)  # The action type of a particular game
+
+
+class Game(Protocol[S, A]):
+    """The interface shared by bucket_game, halving_game and tic_tac_toe.
+
+    The engine assumes a two-player zero-sum game between players 0 and 1, so
+    the value of a state is always P1's utility: player 0 maximizes it and
+    player 1 minimizes it.
+    """
+
+    def to_move(self, state: S) -> int: ...
+
+    def actions(self, state: S) -> list[A]: ...
+
+    def result(self, state: S, action: A) -> S: ...
+
+    def is_terminal(self, state: S) -> bool: ...
+
+    def utility(self, state: S, player: int) -> float: ...
+
+
+class HashableGame(Game[S, A], Protocol[S, A]):
+    """A game that can be searched with a transposition table.
+
+    A game whose hash is shared by symmetric states also implements
+    canonical_action(state, action) and oriented_action(state, action), which
+    turn an action of state into the matching action of its canonical form and
+    back, so the best actions in the table fit every state with the key.
+    """
+
+    def zobrist_hash(self, state: S) -> int:
+        """Returns the hash of a state computed from scratch."""
+        ...
+
+    def zobrist_update(self, key: int, state: S, action: A) -> int:
+        """Returns the hash of result(state, action), given that the hash of
+        state is key."""
+        ...
+
+
+EXACT = 0  # The stored value is the value of the state
+LOWER = 1  # The value of the state is at least the stored value
+UPPER = 2  # The value of the state is at most the stored value
+
+FULL_DEPTH = math.inf  # Depth of entries stored by a search to the end of the game
+
+
+class TranspositionTable(Generic[A]):
+    def __init__(self, size: int = 1 << 16):
+        """A size-bounded map from state hashes to search results.
+
+        When the table is full, the least recently used entry is evicted.
+
+        Args:
+            size: The maximum number of entries
+        """
+        self.size = size
+        self.entries: OrderedDict[int, tuple[float, float, int, A | None]] = (
+            OrderedDict()
+        )
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: int) -> tuple[float, float, int, A | None] | None:
+        """Returns the (value, depth, bound, best action) stored for key, if any."""
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+
+        return entry
+
+    def store(
+        self, key: int, value: float, depth: float, bound: int, action: A | None
+    ) -> None:
+        self.entries[key] = value, depth, bound, action
+        self.entries.move_to_end(key)
+
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class MoveOrdering(Generic[A]):
+    """Keeps the actions in the order the game returns them.
+
+    Subclasses reorder the actions of interior nodes and learn from the
+    actions that caused a cutoff.
+    """
+
+    def order(self, state: S, actions: list[A], ply: int) -> list[A]:
+        return actions
+
+    def cutoff(self, action: A, ply: int) -> None:
+        pass
+
+    def advance(self) -> None:
+        """Called when the root moves one ply down, after a move is played."""
+        pass
+
+
+class KillerMoves(MoveOrdering[A]):
+    """Tries the last actions that caused a cutoff at the same ply first."""
+
+    def __init__(self, slots: int = 2):
+        self.slots = slots
+        self.killers: dict[int, list[A]] = {}
+
+    def order(self, state: S, actions: list[A], ply: int) -> list[A]:
+        killers = [killer for killer in self.killers.get(ply, []) if killer in actions]
+
+        if not killers:
+            return actions
+
+        return killers + [action for action in actions if action not in killers]
+
+    def cutoff(self, action: A, ply: int) -> None:
+        killers = self.killers.setdefault(ply, [])
+
+        if action in killers:
+            killers.remove(action)
+
+        killers.insert(0, action)
+        del killers[self.slots :]
+
+    def advance(self) -> None:
+        # the killers of ply 1 are the killers of the new root
+        self.killers = {
+            ply - 1: killers for ply, killers in self.killers.items() if ply
+        }
+
+
+class HistoryHeuristic(MoveOrdering[A]):
+    """Tries the actions that have caused the most cutoffs anywhere first."""
+
+    def __init__(self):
+        self.scores: dict[A, int] = {}
+
+    def order(self, state: S, actions: list[A], ply: int) -> list[A]:
+        # sorted() is stable, so equally good actions keep the game's order
+        return sorted(actions, key=lambda action: -self.scores.get(action, 0))
+
+    def cutoff(self, action: A, ply: int) -> None:
+        self.scores[action] = self.scores.get(action, 0) + 1
+
+
+class CombinedOrdering(MoveOrdering[A]):
+    """Applies several orderings in turn, the last one having the final say."""
+
+    def __init__(self, *orderings: MoveOrdering[A]):
+        self.orderings = orderings
+
+    def order(self, state: S, actions: list[A], ply: int) -> list[A]:
+        for ordering in self.orderings:
+            actions = ordering.order(state, actions, ply)
+
+        return actions
+
+    def cutoff(self, action: A, ply: int) -> None:
+        for ordering in self.orderings:
+            ordering.cutoff(action, ply)
+
+    def advance(self) -> None:
+        for ordering in self.orderings:
+            ordering.advance()
+
+
+def default_ordering() -> MoveOrdering[Any]:
+    # killer moves go in front of the history ordering
+    return CombinedOrdering(HistoryHeuristic(), KillerMoves())
+
+
+class SearchStats:
+    """Counters and timings collected by a search that is given one.
+
+    A search without a SearchStats pays for nothing but a None check per
+    interior node. One SearchStats can collect several searches, such as the
+    moves of a whole game.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.time = 0.0
+        self.nodes = 0
+        self.cutoffs = 0
+        self.terminal_evaluations = 0
+        self.heuristic_evaluations = 0
+        self.table_hits = 0
+        self.table_misses = 0
+        self.peak_depth = 0
+
+        # Calls to and seconds spent in each Game method
+        self.calls: dict[str, int] = {}
+        self.call_time: dict[str, float] = {}
+
+        # Expanded nodes and the actions they had, by ply
+        self.expanded: list[int] = []
+        self.children: list[int] = []
+
+        # Depth, seconds and nodes of every completed iterative deepening
+        # iteration
+        self.iterations: list[tuple[int, float, int]] = []
+
+    def call(self, method: str, seconds: float) -> None:
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.call_time[method] = self.call_time.get(method, 0.0) + seconds
+
+    def expand(self, ply: int, actions: int) -> None:
+        while len(self.expanded) <= ply:
+            self.expanded.append(0)
+            self.children.append(0)
+
+        self.expanded[ply] += 1
+        self.children[ply] += actions
+
+    def branching_factors(self) -> list[float]:
+        """Returns the average number of actions of the nodes at each ply."""
+        return [
+            children / expanded if expanded else 0.0
+            for expanded, children in zip(self.expanded, self.children)
+        ]
+
+    def as_dict(self) -> dict[str, Any]:
+        lookups = self.table_hits + self.table_misses
+
+        return {
+            "searches": self.searches,
+            "time": self.time,
+            "nodes": self.nodes,
+            "nodes_per_second": self.nodes / self.time if self.time else 0.0,
+            "expanded": sum(self.expanded),
+            "cutoffs": self.cutoffs,
+            "terminal_evaluations": self.terminal_evaluations,
+            "heuristic_evaluations": self.heuristic_evaluations,
+            "table_hits": self.table_hits,
+            "table_misses": self.table_misses,
+            "table_hit_rate": self.table_hits / lookups if lookups else 0.0,
+            "peak_depth": self.peak_depth,
+            "calls": self.calls,
+            "call_time": self.call_time,
+            "expanded_per_ply": self.expanded,
+            "branching_factors": self.branching_factors(),
+            "iterations": [
+                {"depth": depth, "time": seconds, "nodes": nodes}
+                for depth, seconds, nodes in self.iterations
+            ],
+        }
+
+    def to_json(self, indent: int | None = 2) -> str:
+        return json.dumps(self.as_dict(), indent=indent)
+
+
+class _InstrumentedGame(Generic[S, A]):
+    """Times and counts the calls a search makes to a game."""
+
+    def __init__(self, game: Game[S, A], stats: SearchStats):
+        self.game = game
+        self.stats = stats
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.game, name)
+
+    def to_move(self, state: S) -> int:
+        return self.game.to_move(state)
+
+    def actions(self, state: S) -> list[A]:
+        start_time = time.perf_counter()
+        actions = self.game.actions(state)
+        self.stats.call("actions", time.perf_counter() - start_time)
+
+        return actions
+
+    def result(self, state: S, action: A) -> S:
+        start_time = time.perf_counter()
+        result = self.game.result(state, action)
+        self.stats.call("result", time.perf_counter() - start_time)
+
+        return result
+
+    def is_terminal(self, state: S) -> bool:
+        start_time = time.perf_counter()
+        terminal = self.game.is_terminal(state)
+        self.stats.call("is_terminal", time.perf_counter() - start_time)
+
+        return terminal
+
+    def utility(self, state: S, player: int) -> float:
+        start_time = time.perf_counter()
+        utility = self.game.utility(state, player)
+        self.stats.call("utility", time.perf_counter() - start_time)
+        self.stats.terminal_evaluations += 1
+
+        return utility
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its deadline has passed."""
+
+
+def _move_to_front(actions: list[A], action: A | None) -> list[A]:
+    if action is None or action not in actions or actions[0] == action:
+        return actions
+
+    return [action] + [a for a in actions if a != action]
+
+
+def _zero(state: Any) -> float:
+    return 0
+
+
+class AlphaBeta(Generic[S, A]):
+    def __init__(
+        self,
+        game: Game[S, A],
+        ordering: MoveOrdering[A] | None = None,
+        table: TranspositionTable[A] | None = None,
+        evaluate: Callable[[S], float] | None = None,
+        stats: SearchStats | None = None,
+    ):
+        """Alpha-beta search over any game with the shared Game interface.
+
+        Args:
+            game: The game to search
+            ordering: How to order the actions of interior nodes
+            table: Where to remember searched states, which requires the game
+                to implement zobrist_hash and zobrist_update
+            evaluate: Estimates P1's utility of a non-terminal state where a
+                depth-limited search stops, by default 0
+            stats: Where to collect counters and timings, if anywhere
+        """
+        # the zobrist methods are only called when there is a table
+        self.game = cast(
+            HashableGame[S, A],
+            game if stats is None else _InstrumentedGame(game, stats),
+        )
+        self.ordering = default_ordering() if ordering is None else ordering
+        self.table = table
+        self.evaluate = _zero if evaluate is None else evaluate
+        self.stats = stats
+
+        # best actions go into the table in the orientation of the canonical state
+        self.canonical_action = getattr(game, "canonical_action", None)
+        self.oriented_action = getattr(game, "oriented_action", None)
+
+        if stats is not None:
+            evaluate = self.evaluate
+
+            def counted_evaluate(state: S) -> float:
+                stats.heuristic_evaluations += 1
+                return evaluate(state)
+
+            self.evaluate = counted_evaluate
+
+        self.deadline: float | None = None  # time.perf_counter() to stop at
+        self.pv: list[A] = []  # Actions to try first, ply by ply
+        self.track_line = False  # Whether to collect principal variations
+        self.line: list[A] = []  # Principal variation of the last node
+        self.depth_limited = False  # Whether the last value relied on a depth cutoff
+        self.depth = 0  # Depth of the last completed iterative deepening iteration
+
+        self.root_action: A | None = None
+        self.root_value = 0.0
+        self.root_line: list[A] = []
+
+        self.nodes = 0
+        self.cutoffs = 0
+
+    def check_deadline(self) -> None:
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            raise SearchTimeout
+
+    def value(
+        self,
+        state: S,
+        alpha: float,
+        beta: float,
+        ply: int,
+        key: int = 0,
+        depth: float = FULL_DEPTH,
+    ) -> float:
+        """Returns P1's utility of the state if it lies within (alpha, beta),
+        otherwise a bound on the side of the window it fell out of.
+
+        If track_line is set, the principal variation below the state is left
+        in self.line.
+        """
+        game = self.game
+        table = self.table
+        self.nodes += 1
+
+        if self.nodes & 127 == 0:
+            self.check_deadline()
+
+        if game.is_terminal(state):
+            self.line = []
+            return game.utility(state, 0)
+
+        if depth <= 0:
+            self.depth_limited = True
+            self.line = []
+            return self.evaluate(state)
+
+        limited = False  # Whether the value relies on a depth-limited entry
+        entry = None if table is None else table.get(key)
+
+        # a table hit that settles the value needs no actions at all
+        if entry is not None:
+            value, entry_depth, bound, best_action = entry
+
+            if best_action is not None and self.oriented_action is not None:
+                best_action = self.oriented_action(state, best_action)
+
+            if entry_depth >= depth:
+                limited = entry_depth != FULL_DEPTH
+
+                if bound == LOWER:
+                    alpha = max(alpha, value)
+                elif bound == UPPER:
+                    beta = min(beta, value)
+
+                if bound == EXACT or alpha >= beta:
+                    self.depth_limited |= limited
+                    self.line = [] if best_action is None else [best_action]
+                    return value
+
+        actions = self.ordering.order(state, game.actions(state), ply)
+
+        if self.stats is not None:
+            self.stats.expand(ply, len(actions))
+
+        if ply < len(self.pv):
+            actions = _move_to_front(actions, self.pv[ply])
+
+        if entry is not None:
+            # the best action from last time is likely still the best one
+            actions = _move_to_front(actions, best_action)
+
+        # entries below a depth cutoff only hold for searches as shallow
+        limited_outside = self.depth_limited
+        self.depth_limited = limited
+
+        alpha_original = alpha
+        beta_original = beta
+        best_action = None
+        line: list[A] = []
+
+        if game.to_move(state) == 0:
+            v = -math.inf
+
+            for action in actions:
+                child_value = self.value(
+                    game.result(state, action),
+                    alpha,
+                    beta,
+                    ply + 1,
+                    0 if table is None else game.zobrist_update(key, state, action),
+                    depth - 1,
+                )
+
+                if child_value > v:
+                    v = child_value
+                    best_action = action
+
+                    if self.track_line:
+                        line = [action] + self.line
+
+                if v >= beta:
+                    self.cutoffs += 1
+                    self.ordering.cutoff(action, ply)
+                    break
+
+                alpha = max(alpha, v)
+        else:
+            v = math.inf
+
+            for action in actions:
+                child_value = self.value(
+                    game.result(state, action),
+                    alpha,
+                    beta,
+                    ply + 1,
+                    0 if table is None else game.zobrist_update(key, state, action),
+                    depth - 1,
+                )
+
+                if child_value < v:
+                    v = child_value
+                    best_action = action
+
+                    if self.track_line:
+                        line = [action] + self.line
+
+                if v <= alpha:
+                    self.cutoffs += 1
+                    self.ordering.cutoff(action, ply)
+                    break
+
+                beta = min(beta, v)
+
+        assert v not in (-math.inf, math.inf)
+
+        if table is not None:
+            if v <= alpha_original:
+                bound = UPPER
+            elif v >= beta_original:
+                bound = LOWER
+            else:
+                bound = EXACT
+
+            if best_action is not None and self.canonical_action is not None:
+                best_action = self.canonical_action(state, best_action)
+
+            table.store(
+                key, v, depth if self.depth_limited else FULL_DEPTH, bound, best_action
+            )
+
+        self.depth_limited |= limited_outside
+        self.line = line
+
+        return v
+
+    def search(
+        self, state: S, depth: float = FULL_DEPTH, first: A | None = None
+    ) -> A | None:
+        """Returns the best action for the player whose turn it is.
+
+        The root actions are searched in the game's order so that ties are
+        broken the same way as plain minimax, by keeping the first best action.
+        The best action found so far, its value and its principal variation
+        are kept in root_action, root_value and root_line, so they survive a
+        SearchTimeout.
+
+        Args:
+            state: The state to search from
+            depth: How many plies to search before evaluating the state
+            first: An action to search before all the others
+        """
+        game = self.game
+        maximizing = game.to_move(state) == 0
+
+        self.root_action = None
+        self.root_value = -math.inf if maximizing else math.inf
+        self.root_line = []
+
+        key = 0 if self.table is None else game.zobrist_hash(state)
+        actions = game.actions(state)
+        self.nodes += 1
+
+        if self.stats is not None:
+            self.stats.expand(0, len(actions))
+
+        for action in _move_to_front(actions, first):
+            self.check_deadline()
+
+            result = game.result(state, action)
+            child_key = (
+                0 if self.table is None else game.zobrist_update(key, state, action)
+            )
+
+            if maximizing:
+                alpha, beta = self.root_value, math.inf
+            else:
+                alpha, beta = -math.inf, self.root_value
+
+            v = self.value(result, alpha, beta, 1, child_key, depth - 1)
+
+            if v > self.root_value if maximizing else v < self.root_value:
+                self.root_value = v
+                self.root_action = action
+                self.root_line = [action] + self.line if self.track_line else []
+
+        return self.root_action
+
+    def iterative_deepening(
+        self,
+        state: S,
+        time_budget: float | None = None,
+        max_depth: int | None = None,
+    ) -> A | None:
+        """Searches one ply deeper at a time until the time budget is spent,
+        max_depth is reached, or the whole game tree has been searched.
+
+        Every iteration searches the previous iteration's principal variation
+        first, so ties at the root go to that action rather than to the first
+        one in the game's order. A principal variation left in self.pv before
+        the call is searched first by the first iteration.
+
+        Args:
+            state: The state to search from
+            time_budget: Seconds to search for, or None for no limit
+            max_depth: The deepest iteration, or None for no limit
+
+        Returns:
+            The best action of the deepest completed iteration, or of the
+            unfinished one if no iteration completed
+        """
+        if time_budget is not None:
+            self.deadline = time.perf_counter() + time_budget
+
+        self.depth = 0
+        self.track_line = True
+        best_action = self.pv[0] if self.pv else None
+        depth = 1
+
+        try:
+            while max_depth is None or depth <= max_depth:
+                start_time = time.perf_counter()
+                start_nodes = self.nodes
+
+                self.depth_limited = False
+                best_action = self.search(state, depth, best_action)
+                self.depth = depth
+                self.pv = self.root_line
+
+                if self.stats is not None:
+                    self.stats.iterations.append(
+                        (
+                            depth,
+                            time.perf_counter() - start_time,
+                            self.nodes - start_nodes,
+                        )
+                    )
+
+                # without depth cutoffs, a deeper search finds nothing new
+                if not self.depth_limited:
+                    break
+
+                depth += 1
+        except SearchTimeout:
+            if best_action is None:
+                best_action = self.root_action
+        finally:
+            self.deadline = None
+            self.track_line = False
+            self.pv = []
+
+        if best_action is None:
+            actions = self.game.actions(state)
+            best_action = actions[0] if actions else None
+
+        return best_action
+
+
+class _Frame(Generic[S, A]):
+    """An interior node whose actions are being searched by IterativeAlphaBeta."""
+
+    __slots__ = (
+        "state",
+        "key",
+        "depth",
+        "limited_outside",
+        "alpha",
+        "beta",
+        "alpha_original",
+        "beta_original",
+        "maximizing",
+        "ply",
+        "actions",
+        "index",
+        "action",
+        "best_action",
+        "line",
+        "v",
+    )
+
+    state: S
+    key: int
+    depth: float
+    limited_outside: bool
+    alpha: float
+    beta: float
+    alpha_original: float
+    beta_original: float
+    maximizing: bool
+    ply: int
+    actions: list[A]
+    index: int  # Index of the next action to search
+    action: A  # The action being searched
+    best_action: A | None
+    line: list[A]
+    v: float
+
+
+class IterativeAlphaBeta(AlphaBeta[S, A]):
+    """AlphaBeta that keeps its own stack instead of recursing.
+
+    It visits the same nodes in the same order as AlphaBeta, so it returns
+    the same actions, but the depth of the game is not limited by Python's
+    recursion limit. peak_depth is the largest number of frames that were
+    on the stack at once.
+    """
+
+    def __init__(
+        self,
+        game: Game[S, A],
+        ordering: MoveOrdering[A] | None = None,
+        table: TranspositionTable[A] | None = None,
+        evaluate: Callable[[S], float] | None = None,
+        stats: SearchStats | None = None,
+    ):
+        super().__init__(game, ordering, table, evaluate, stats)
+        self.peak_depth = 0
+
+    def value(
+        self,
+        state: S,
+        alpha: float,
+        beta: float,
+        ply: int,
+        key: int = 0,
+        depth: float = FULL_DEPTH,
+    ) -> float:
+        game = self.game
+        table = self.table
+        ordering = self.ordering
+        pv = self.pv
+        stack: list[_Frame[S, A]] = []
+
+        while True:
+            # enter the next node, which either has a value right away
+            # or becomes a new frame on top of the stack
+            self.nodes += 1
+            value = None
+            line: list[A] = []
+
+            if self.nodes & 127 == 0:
+                self.check_deadline()
+
+            if game.is_terminal(state):
+                value = game.utility(state, 0)
+            elif depth <= 0:
+                self.depth_limited = True
+                value = self.evaluate(state)
+            else:
+                entry = None if table is None else table.get(key)
+                limited = False
+
+                if entry is not None:
+                    entry_value, entry_depth, bound, best_action = entry
+
+                    if best_action is not None and self.oriented_action is not None:
+                        best_action = self.oriented_action(state, best_action)
+
+                    if entry_depth >= depth:
+                        limited = entry_depth != FULL_DEPTH
+
+                        if bound == LOWER:
+                            alpha = max(alpha, entry_value)
+                        elif bound == UPPER:
+                            beta = min(beta, entry_value)
+
+                        if bound == EXACT or alpha >= beta:
+                            self.depth_limited |= limited
+                            value = entry_value
+                            line = [] if best_action is None else [best_action]
+
+                if value is None:
+                    actions = ordering.order(state, game.actions(state), ply)
+
+                    if self.stats is not None:
+                        self.stats.expand(ply, len(actions))
+
+                    if ply < len(pv):
+                        actions = _move_to_front(actions, pv[ply])
+
+                    if entry is not None:
+                        actions = _move_to_front(actions, best_action)
+
+                    frame: _Frame[S, A] = _Frame()
+                    frame.limited_outside = self.depth_limited
+                    self.depth_limited = limited
+                    frame.state = state
+                    frame.key = key
+                    frame.depth = depth
+                    frame.alpha = frame.alpha_original = alpha
+                    frame.beta = frame.beta_original = beta
+                    frame.maximizing = game.to_move(state) == 0
+                    frame.ply = ply
+                    frame.actions = actions
+                    frame.index = 0
+                    frame.best_action = None
+                    frame.line = []
+                    frame.v = -math.inf if frame.maximizing else math.inf
+                    stack.append(frame)
+
+                    if len(stack) > self.peak_depth:
+                        self.peak_depth = len(stack)
+
+            # hand values up the stack until a frame has an action left to search
+            while True:
+                if not stack:
+                    assert value is not None
+                    self.line = line
+                    return value
+
+                frame = stack[-1]
+
+                if value is not None:
+                    if frame.maximizing:
+                        if value > frame.v:
+                            frame.v = value
+                            frame.best_action = frame.action
+
+                            if self.track_line:
+                                frame.line = [frame.action] + line
+
+                        if frame.v >= frame.beta:
+                            self.cutoffs += 1
+                            ordering.cutoff(frame.action, frame.ply)
+                            frame.index = len(frame.actions)
+                        else:
+                            frame.alpha = max(frame.alpha, frame.v)
+                    else:
+                        if value < frame.v:
+                            frame.v = value
+                            frame.best_action = frame.action
+
+                            if self.track_line:
+                                frame.line = [frame.action] + line
+
+                        if frame.v <= frame.alpha:
+                            self.cutoffs += 1
+                            ordering.cutoff(frame.action, frame.ply)
+                            frame.index = len(frame.actions)
+                        else:
+                            frame.beta = min(frame.beta, frame.v)
+
+                if frame.index < len(frame.actions):
+                    action = frame.actions[frame.index]
+                    frame.index += 1
+                    frame.action = action
+
+                    state = game.result(frame.state, action)
+                    alpha = frame.alpha
+                    beta = frame.beta
+                    ply = frame.ply + 1
+                    depth = frame.depth - 1
+
+                    if table is not None:
+                        key = game.zobrist_update(frame.key, frame.state, action)
+
+                    break
+
+                stack.pop()
+                value = frame.v
+                line = frame.line
+
+                assert value not in (-math.inf, math.inf)
+
+                if table is not None:
+                    if value <= frame.alpha_original:
+                        bound = UPPER
+                    elif value >= frame.beta_original:
+                        bound = LOWER
+                    else:
+                        bound = EXACT
+
+                    best_action = frame.best_action
+
+                    if best_action is not None and self.canonical_action is not None:
+                        best_action = self.canonical_action(frame.state, best_action)
+
+                    depth = frame.depth if self.depth_limited else FULL_DEPTH
+                    table.store(frame.key, value, depth, bound, best_action)
+
+                self.depth_limited |= frame.limited_outside
+
+
+# The best score any worker has proven for the root player, shared by the
+# processes of a ParallelAlphaBeta pool, and each worker's transposition table
+_shared_bound: Any = None
+_worker_table: TranspositionTable | None = None
+
+
+def _init_worker(bound: Any, table_size: int | None) -> None:
+    global _shared_bound, _worker_table
+    _shared_bound = bound
+    _worker_table = None if table_size is None else TranspositionTable(table_size)
+
+
+def _search_root_action(
+    game: Game[S, A],
+    state: S,
+    index: int,
+    action: A,
+    ordering: MoveOrdering[A] | None,
+) -> tuple[int, float, bool, int, int]:
+    """Searches one root action in a worker process.
+
+    Returns:
+        The index of the action, the value it got, whether that value is
+        exact rather than a bound, the number of nodes and the worker's pid
+    """
+    maximizing = game.to_move(state) == 0
+    bound = _shared_bound.value
+    searcher = AlphaBeta(game, ordering, _worker_table)
+
+    result = game.result(state, action)
+    key = 0 if _worker_table is None else searcher.game.zobrist_hash(result)
+
+    if maximizing:
+        v = searcher.value(result, bound, math.inf, 1, key)
+    else:
+        v = searcher.value(result, -math.inf, -bound, 1, key)
+
+    score = v if maximizing else -v
+    exact = score > bound
+
+    if exact:
+        with _shared_bound.get_lock():
+            _shared_bound.value = max(_shared_bound.value, score)
+
+    return index, v, exact, searcher.nodes + 1, os.getpid()
+
+
+class ParallelAlphaBeta(Generic[S, A]):
+    def __init__(
+        self,
+        game: Game[S, A],
+        workers: int | None = None,
+        ordering: MoveOrdering[A] | None = None,
+        table_size: int | None = None,
+    ):
+        """Alpha-beta search that spreads the root actions over processes.
+
+        Every root action is searched with the best score proven so far by
+        any worker as its bound, so later actions are still pruned. The
+        processes, and their transposition tables, are kept from one search
+        to the next until close is called.
+
+        Args:
+            game: The game to search, which must be picklable
+            workers: The number of processes, by default the number of CPUs
+            ordering: How to order the actions of interior nodes
+            table_size: Size of each worker's transposition table, which
+                requires the game to implement zobrist_hash and zobrist_update
+        """
+        self.game = game
+        self.ordering = ordering
+
+        self.bound = multiprocessing.Value("d", -math.inf)
+        self.pool = ProcessPoolExecutor(
+            workers, initializer=_init_worker, initargs=(self.bound, table_size)
+        )
+
+        self.nodes = 0
+        self.worker_nodes: dict[int, int] = {}  # Nodes searched per worker pid
+
+    def search(self, state: S) -> A | None:
+        """Returns the same action as AlphaBeta.search."""
+        game = self.game
+        actions = game.actions(state)
+        maximizing = game.to_move(state) == 0
+
+        if not actions:
+            return None
+
+        self.bound.value = -math.inf
+        results: list[tuple[float, bool]] = [(0, False)] * len(actions)
+
+        def submit(index: int) -> Future:
+            return self.pool.submit(
+                _search_root_action,
+                game,
+                state,
+                index,
+                actions[index],
+                self.ordering,
+            )
+
+        # the first action is searched on its own to get a bound that
+        # the others can be pruned against
+        outcomes = [submit(0).result()]
+        futures = [submit(index) for index in range(1, len(actions))]
+        outcomes += [future.result() for future in futures]
+
+        for index, v, exact, nodes, pid in outcomes:
+            results[index] = v, exact
+            self.nodes += nodes
+            self.worker_nodes[pid] = self.worker_nodes.get(pid, 0) + nodes
+
+        def score(v: float) -> float:
+            return v if maximizing else -v
+
+        best_score = max(score(v) for v, exact in results if exact)
+        best_index = min(
+            index
+            for index, (v, exact) in enumerate(results)
+            if exact and score(v) == best_score
+        )
+
+        # serial search keeps the first best action, so an earlier action whose
+        # bound ties the best score has to be searched again to see if it is one
+        searcher = AlphaBeta(game, self.ordering)
+
+        for index in range(best_index):
+            v, exact = results[index]
+
+            if exact or score(v) < best_score:
+                continue
+
+            result = game.result(state, actions[index])
+            v = searcher.value(result, -math.inf, math.inf, 1)
+
+            if score(v) == best_score:
+                best_index = index
+                break
+
+        self.nodes += searcher.nodes
+
+        return actions[best_index]
+
+    def close(self) -> None:
+        self.pool.shutdown()
+
+
+class Searcher(Generic[S, A]):
+    def __init__(
+        self,
+        game: Game[S, A],
+        state: S,
+        ordering: MoveOrdering[A] | None = None,
+        table: TranspositionTable[A] | None = None,
+        iterative: bool = False,
+        time_budget: float | None = None,
+        max_depth: int | None = None,
+        evaluate: Callable[[S], float] | None = None,
+    ):
+        """Searches the moves of one game in turn, keeping what it learned.
+
+        The engine, its move ordering and the transposition table live as
+        long as the searcher, and the principal variation of each search
+        orders the next one. After a move is played, advance moves the root
+        down to the new state, so the next search mostly finds its subtree
+        in the table already.
+
+        Args:
+            game: The game to search
+            state: The state to start from
+            ordering: How to order the actions of interior nodes
+            table: Transposition table kept between moves, by default a new
+                one if the game implements zobrist_hash
+            iterative: Whether to search with an explicit stack
+            time_budget: Seconds to search each move for
+            max_depth: The number of plies to search each move at most
+            evaluate: Estimates P1's utility of the states where the maximum
+                depth cuts the search off
+        """
+        if table is None and hasattr(game, "zobrist_hash"):
+            table = TranspositionTable()
+
+        engine = IterativeAlphaBeta if iterative else AlphaBeta
+
+        self.game = cast(HashableGame[S, A], game)  # Hashable if there is a table
+        self.state = state
+        self.table = table
+        self.engine = engine(game, ordering, table, evaluate)
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+
+        self.pv: list[A] = []  # The expected line from self.state
+
+    def search(self) -> A | None:
+        """Returns the best action in self.state."""
+        engine = self.engine
+        engine.pv = self.pv
+
+        if self.time_budget is None and self.max_depth is None:
+            action = engine.search(self.state)
+            engine.pv = []
+            line = [] if action is None else [action] + self.table_line(action)
+        else:
+            action = engine.iterative_deepening(
+                self.state, self.time_budget, self.max_depth
+            )
+            line = engine.root_line
+
+        # a timed out iteration may have left a line for another action
+        if line and line[0] == action:
+            self.pv = line
+        else:
+            self.pv = [] if action is None else [action]
+
+        return action
+
+    def table_line(self, action: A) -> list[A]:
+        """Returns the best actions the table holds after action in self.state."""
+        if self.table is None:
+            return []
+
+        game = self.game
+        oriented_action = self.engine.oriented_action
+        key = game.zobrist_update(game.zobrist_hash(self.state), self.state, action)
+        state = game.result(self.state, action)
+        line: list[A] = []
+        seen = set()
+
+        while key not in seen and not game.is_terminal(state):
+            seen.add(key)
+            entry = self.table.entries.get(key)  # get() would count a hit
+
+            if entry is None or entry[3] is None:
+                break
+
+            action = entry[3]
+
+            if oriented_action is not None:
+                action = oriented_action(state, action)
+
+            # an entry of another state with a colliding key holds any action
+            if action not in game.actions(state):
+                break
+
+            line.append(action)
+            key = game.zobrist_update(key, state, action)
+            state = game.result(state, action)
+
+        return line
+
+    def advance(self, action: A) -> S:
+        """Plays action from self.state and returns the new state."""
+        self.state = self.game.result(self.state, action)
+        self.engine.ordering.advance()
+
+        # the rest of the line still applies if the expected action was played
+        self.pv = self.pv[1:] if self.pv and self.pv[0] == action else []
+
+        return self.state
+
+
+def minimax_search(
+    game: Game[S, A],
+    state: S,
+    ordering: MoveOrdering[A] | None = None,
+    table: TranspositionTable[A] | None = None,
+    iterative: bool = False,
+    time_budget: float | None = None,
+    max_depth: int | None = None,
+    evaluate: Callable[[S], float] | None = None,
+    workers: int | None = None,
+    stats: SearchStats | None = None,
+) -> A | None:
+    """Returns the minimax action for the player whose turn it is.
+
+    Without a time budget or maximum depth the whole game tree is searched.
+    With either, the search deepens one ply at a time and returns the best
+    action of the deepest iteration it had time for.
+
+    Passing workers searches the whole game tree with that many processes,
+    which cannot be combined with a table, an explicit stack, a time budget,
+    a maximum depth or an evaluation function. ParallelAlphaBeta gives each
+    process a table of its own and keeps the processes between searches.
+
+    Args:
+        game: The game to search
+        state: The state to search from
+        ordering: How to order the actions of interior nodes
+        table: Transposition table to look up and store searched states in,
+            by default a new one for an iterative search if the game
+            implements zobrist_hash
+        iterative: Whether to search with an explicit stack, for games deeper
+            than the recursion limit
+        time_budget: Seconds to search for
+        max_depth: The number of plies to search at most
+        evaluate: Estimates P1's utility of the states where the maximum
+            depth cuts the search off
+        workers: The number of processes to search the root actions with
+        stats: Where to collect counters and timings of the search, which
+            only get node counts and timings from a parallel search
+
+    Returns:
+        The best action, or None if the state has no actions
+
+    Raises:
+        ValueError: If workers is combined with an option it does not support
+    """
+    if workers is not None:
+        options = {
+            "table": table is not None,
+            "iterative": iterative,
+            "time_budget": time_budget is not None,
+            "max_depth": max_depth is not None,
+            "evaluate": evaluate is not None,
+        }
+        unsupported = [name for name, given in options.items() if given]
+
+        if unsupported:
+            raise ValueError(
+                f"workers cannot be combined with {', '.join(unsupported)}"
+            )
+
+    if iterative and table is None and hasattr(game, "zobrist_hash"):
+        # games too deep to recurse through reach their states by too many
+        # paths to search them all
+        table = TranspositionTable()
+
+    if table is not None:
+        table_hits = table.hits
+        table_misses = table.misses
+
+    start_time = time.perf_counter()
+
+    if workers is not None:
+        searcher: Any = ParallelAlphaBeta(game, workers, ordering)
+
+        try:
+            action = searcher.search(state)
+        finally:
+            searcher.close()
+    else:
+        engine = IterativeAlphaBeta if iterative else AlphaBeta
+        searcher = engine(game, ordering, table, evaluate, stats)
+
+        if time_budget is None and max_depth is None:
+            action = searcher.search(state)
+        else:
+            action = searcher.iterative_deepening(state, time_budget, max_depth)
+
+    if stats is not None:
+        stats.searches += 1
+        stats.time += time.perf_counter() - start_time
+        stats.nodes += searcher.nodes
+        stats.cutoffs += getattr(searcher, "cutoffs", 0)
+        stats.peak_depth = max(stats.peak_depth, getattr(searcher, "peak_depth", 0))
+
+        if table is not None and workers is None:
+            stats.table_hits += table.hits - table_hits
+            stats.table_misses += table.misses - table_misses
+
+    return action
@@ -0,0 +1,172 @@
+import argparse
+from itertools import cycle
+from multiprocessing import Pool
+import json
+import math
+import random
+import sys
+import time
+from typing import Any, Iterator
+
+import bucket_game
+import halving_game
+import tic_tac_toe
+from search import IterativeAlphaBeta, TranspositionTable
+
+GAMES = ["tic_tac_toe", "halving_game", "bucket_game"]
+
+Job = tuple[str, int, int, int]  # Tuple of game name, N (for the halving game),
+# random seed and number of random opening moves
+
+
+def make_game(name: str, N: int) -> Any:
+    if name == "tic_tac_toe":
+        return tic_tac_toe.Game()
+
+    if name == "halving_game":
+        return halving_game.Game(N)
+
+    if name == "bucket_game":
+        return bucket_game.Game()
+
+    raise ValueError(f"Unknown game {name}")
+
+
+def play(job: Job) -> dict[str, Any]:
+    """Plays one game to the end and returns a record of it.
+
+    The first moves are picked at random, the rest by minimax search.
+    """
+    name, N, seed, opening_moves = job
+    game = make_game(name, N)
+    rng = random.Random(seed)
+
+    # games that can be hashed keep one table for the whole game, large enough
+    # to hold the states of a halving game from N without evicting them
+    table: TranspositionTable[Any] | None = None
+
+    if hasattr(game, "zobrist_hash"):
+        table = TranspositionTable(max(1 << 16, 4 * N))
+
+    state = game.initial_state()
+    moves: list[Any] = []
+    move_times = []
+    nodes = 0
+    start_time = time.perf_counter()
+
+    while not game.is_terminal(state):
+        if len(moves) < opening_moves:
+            action = rng.choice(game.actions(state))
+        else:
+            move_start_time = time.perf_counter()
+            searcher = IterativeAlphaBeta(game, table=table)
+            action = searcher.search(state)
+            move_times.append(time.perf_counter() - move_start_time)
+            nodes += searcher.nodes
+
+        assert action is not None
+
+        moves.append(action)
+        state = game.result(state, action)
+
+    return {
+        "game": name,
+        "N": N if name == "halving_game" else None,
+        "seed": seed,
+        "opening_moves": min(opening_moves, len(moves)),
+        "moves": moves,
+        "utility": game.utility(state, 0),
+        "nodes": nodes,
+        "move_times": move_times,
+        "time": time.perf_counter() - start_time,
+    }
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Returns the q-th percentile (0-100) of sorted values by nearest rank."""
+    if not values:
+        return 0.0
+
+    rank = max(0, min(len(values) - 1, math.ceil(q / 100 * len(values)) - 1))
+    return values[rank]
+
+
+def jobs(
+    name: str, games: int, N_min: int, N_max: int, seed: int, opening_moves: int
+) -> Iterator[Job]:
+    Ns = cycle(range(N_min, N_max + 1))
+
+    for i in range(games):
+        yield name, next(Ns), seed + i, opening_moves
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Plays many games by minimax self-play across processes, "
+        "writes one JSON line per game and reports throughput on stderr."
+    )
+    parser.add_argument("game", choices=GAMES)
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--opening-moves",
+        type=int,
+        default=0,
+        help="number of random moves to start every game with",
+    )
+    parser.add_argument(
+        "--N",
+        default="5",
+        help="starting number for the halving game, or a range such as 1:1000 "
+        "that the games cycle through",
+    )
+    parser.add_argument("--output", default="-", help="file for the JSON lines")
+    args = parser.parse_args()
+
+    N_min, _, N_max = args.N.partition(":")
+    job_iterator = jobs(
+        args.game,
+        args.games,
+        int(N_min),
+        int(N_max or N_min),
+        args.seed,
+        args.opening_moves,
+    )
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    move_times: list[float] = []
+    nodes = 0
+    played = 0
+    start_time = time.perf_counter()
+
+    with Pool(args.workers) as pool:
+        for record in pool.imap_unordered(play, job_iterator, chunksize=16):
+            output.write(json.dumps(record) + "\n")
+
+            played += 1
+            nodes += record["nodes"]
+            move_times += record["move_times"]
+
+    elapsed = time.perf_counter() - start_time
+
+    if output is not sys.stdout:
+        output.close()
+
+    move_times.sort()
+
+    print(f"Games: {played} in {elapsed:.2f}s", file=sys.stderr)
+    print(f"Games per second: {played / elapsed:.1f}", file=sys.stderr)
+    print(f"Nodes per second: {nodes / elapsed:.0f}", file=sys.stderr)
+    print(
+        "Move latency: "
+        + ", ".join(
+            f"p{q} {percentile(move_times, q) * 1000:.3f}ms" for q in (50, 90, 99)
+        )
+        + f", max {(move_times[-1] if move_times else 0) * 1000:.3f}ms",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
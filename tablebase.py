@@ -0,0 +1,194 @@
+import mmap
+import os
+
+from tic_tac_toe import (
+    CELLS,
+    Action,
+    BitboardGame,
+    BitState,
+    Game,
+    State,
+    to_bitboard,
+)
+
+# The tablebase holds one byte for every tic-tac-toe board, indexed by reading
+# the board as a base-3 number where cell row * 3 + col is 0 if it is empty,
+# 1 if P1 has a piece there and 2 if P2 has. Reachable positions store
+# (P1's utility + 1) << 4 | best action, where the action is row * 3 + col,
+# or NO_ACTION on terminal positions. Unreachable positions store UNREACHABLE.
+MAGIC = b"TTT1"
+SIZE = 3**9
+NO_ACTION = 0xF
+UNREACHABLE = 0xFF
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), "tic_tac_toe.tb")
+
+# The base-3 digits contributed by the pieces of a bitboard
+_TERNARY = [
+    sum(3 ** (row * 3 + col) for bit, (row, col) in CELLS if bits & bit)
+    for bits in range(1 << 9)
+]
+
+
+def index(state: BitState) -> int:
+    _, x_bits, o_bits = state
+    return _TERNARY[x_bits] + 2 * _TERNARY[o_bits]
+
+
+def build(path: str = DEFAULT_PATH) -> int:
+    """Solves every reachable position and writes the tablebase to path.
+
+    The positions are found ply by ply from the initial state, and then
+    solved from the last ply back to the first, so every child is solved
+    before its parent without any recursion.
+
+    Returns:
+        The number of reachable positions
+    """
+    game = BitboardGame()
+    plies = [[game.initial_state()]]
+    seen = {plies[0][0]}
+
+    while plies[-1]:
+        next_ply = []
+
+        for state in plies[-1]:
+            if game.is_terminal(state):
+                continue
+
+            for action in game.actions(state):
+                result = game.result(state, action)
+
+                if result not in seen:
+                    seen.add(result)
+                    next_ply.append(result)
+
+        plies.append(next_ply)
+
+    table = bytearray([UNREACHABLE]) * SIZE
+    values: dict[BitState, int] = {}
+
+    for ply in reversed(plies):
+        for state in ply:
+            if game.is_terminal(state):
+                value = game.utility(state, 0)
+                table[index(state)] = (value + 1) << 4 | NO_ACTION
+                values[state] = value
+                continue
+
+            # the first action with the best value, like minimax_search
+            maximizing = game.to_move(state) == 0
+            best_action = None
+            best_value = 0
+
+            for action in game.actions(state):
+                value = values[game.result(state, action)]
+
+                if best_action is None or (
+                    value > best_value if maximizing else value < best_value
+                ):
+                    best_action = action
+                    best_value = value
+
+            assert best_action is not None
+
+            row, col = best_action
+            table[index(state)] = (best_value + 1) << 4 | row * 3 + col
+            values[state] = best_value
+
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(table)
+
+    return len(values)
+
+
+class Tablebase:
+    def __init__(self, path: str = DEFAULT_PATH):
+        """Memory-maps a tablebase, building it first if the file is missing.
+
+        Args:
+            path: Where the tablebase is stored
+        """
+        if not os.path.exists(path):
+            build(path)
+
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.data[: len(MAGIC)] != MAGIC or len(self.data) != len(MAGIC) + SIZE:
+            self.data.close()
+            raise ValueError(f"{path} is not a tic-tac-toe tablebase")
+
+    def close(self) -> None:
+        self.data.close()
+
+    def entry(self, state: State | BitState) -> int:
+        # tic_tac_toe.Game states hold a board, BitboardGame states bitboards
+        if len(state) == 2:
+            state = to_bitboard(state)
+
+        player_index, x_bits, o_bits = state
+        entry = self.data[len(MAGIC) + index(state)]
+
+        # the board alone decides whose turn it is in a reachable position
+        turn = x_bits.bit_count() - o_bits.bit_count()
+
+        if entry == UNREACHABLE or player_index != turn:
+            raise KeyError(f"{state} can not be reached from the initial state")
+
+        return entry
+
+    def value(self, state: State | BitState) -> int:
+        """Returns P1's utility of the state under optimal play."""
+        return (self.entry(state) >> 4) - 1
+
+    def best_action(self, state: State | BitState) -> Action | None:
+        """Returns the action minimax_search would choose in the state."""
+        action = self.entry(state) & 0xF
+
+        if action == NO_ACTION:
+            return None
+
+        return divmod(action, 3)
+
+
+def minimax_search(
+    game: Game | BitboardGame,
+    state: State | BitState,
+    tablebase: Tablebase | None = None,
+) -> Action | None:
+    """Looks the minimax action up in a tablebase instead of searching.
+
+    Args:
+        game: Either tic-tac-toe game
+        state: The state to search from
+        tablebase: The tablebase to use, by default the one at DEFAULT_PATH
+
+    Returns:
+        The best action, or None if the state is terminal
+    """
+    if tablebase is None:
+        tablebase = _default_tablebase()
+
+    return tablebase.best_action(state)
+
+
+_default: Tablebase | None = None
+
+
+def _default_tablebase() -> Tablebase:
+    global _default
+
+    if _default is None:
+        _default = Tablebase()
+
+    return _default
+
+
+if __name__ == "__main__":
+    positions = build()
+    print(f"Solved {positions} positions into {DEFAULT_PATH}")
+
+    tablebase = Tablebase()
+    print(f"The value of the initial state is {tablebase.value((0, 0, 0))}")
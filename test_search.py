@@ -0,0 +1,446 @@
+import asyncio
+from functools import cache
+import json
+import math
+import random
+
+import pytest
+
+import backward_induction
+import bench
+import halving_game
+from mcts import MCTS
+import mnk_game
+import move_server
+from search import (
+    AlphaBeta,
+    IterativeAlphaBeta,
+    ParallelAlphaBeta,
+    SearchStats,
+    Searcher,
+    TranspositionTable,
+    minimax_search,
+)
+import selfplay
+from tablebase import Tablebase, build
+from tic_tac_toe import BitboardGame, BitState, Game, SymmetricGame, from_bitboard
+
+bitboard_game = BitboardGame()
+
+
+def reachable_states() -> list[BitState]:
+    """Returns every non-terminal tic-tac-toe position, ply by ply."""
+    states = [bitboard_game.initial_state()]
+    seen = set(states)
+
+    for state in states:
+        for action in bitboard_game.actions(state):
+            result = bitboard_game.result(state, action)
+
+            if result not in seen and not bitboard_game.is_terminal(result):
+                seen.add(result)
+                states.append(result)
+
+    return states
+
+
+@cache
+def minimax_value(state: BitState) -> float:
+    """P1's utility of the state by plain minimax, without any pruning."""
+    if bitboard_game.is_terminal(state):
+        return bitboard_game.utility(state, 0)
+
+    values = [
+        minimax_value(bitboard_game.result(state, action))
+        for action in bitboard_game.actions(state)
+    ]
+
+    return max(values) if bitboard_game.to_move(state) == 0 else min(values)
+
+
+def minimax_action(state: BitState) -> tuple[int, int]:
+    """The first action in the game's order with the minimax value."""
+    for action in bitboard_game.actions(state):
+        if minimax_value(bitboard_game.result(state, action)) == minimax_value(state):
+            return action
+
+    raise AssertionError("no action has the value of the state")
+
+
+states = reachable_states()
+
+
+def test_reachable_states():
+    assert len(states) == 4290
+    assert minimax_value(states[0]) == 0
+
+
+@pytest.mark.parametrize(
+    "engine, game, table",
+    [
+        (AlphaBeta, Game, False),
+        (IterativeAlphaBeta, Game, False),
+        (AlphaBeta, Game, True),
+        (IterativeAlphaBeta, Game, True),
+        (AlphaBeta, BitboardGame, True),
+        (IterativeAlphaBeta, BitboardGame, True),
+        (AlphaBeta, SymmetricGame, True),
+        (IterativeAlphaBeta, SymmetricGame, True),
+    ],
+)
+def test_engines_match_minimax(engine, game, table):
+    # one engine and table for all positions, as a game would keep them
+    searcher = engine(game(), table=TranspositionTable() if table else None)
+
+    for state in states:
+        start = from_bitboard(state) if game is Game else state
+        assert searcher.search(start) == minimax_action(state), state
+
+
+def test_halving_solver():
+    N = 5000
+    solver = halving_game.Solver(N)
+    wins = [True]
+
+    for number in range(1, N + 1):
+        wins.append(not (wins[number - 1] and wins[number // 2]))
+
+    assert list(solver.wins) == wins
+
+    for player in range(2):
+        for number in range(N + 1):
+            value = 1 if wins[number] == (player == 0) else -1
+            assert solver.value((player, number)) == value
+
+    for number in range(1, 40):
+        game = halving_game.Game(number)
+        state = game.initial_state()
+
+        assert solver.best_action(state) == minimax_search(game, state)
+
+    # deeper than the recursion limit, which needs the explicit stack
+    game = halving_game.Game(3000)
+    state = game.initial_state()
+
+    assert minimax_search(game, state, iterative=True) == solver.best_action(state)
+
+
+@pytest.mark.parametrize("engine", [AlphaBeta, IterativeAlphaBeta])
+def test_iterative_deepening(engine):
+    # depth-limited table entries must not cut the deeper iterations short
+    searcher = engine(BitboardGame(), table=TranspositionTable())
+
+    for state in states[::10]:
+        action = searcher.iterative_deepening(state)
+
+        assert searcher.root_value == minimax_value(state), state
+        assert minimax_value(bitboard_game.result(state, action)) == searcher.root_value
+
+    # one ply with an evaluation that likes the center takes it
+    def center(state: BitState) -> float:
+        _, x_bits, o_bits = state
+        return (x_bits >> 4 & 1) - (o_bits >> 4 & 1)
+
+    searcher = engine(BitboardGame(), evaluate=center)
+
+    assert searcher.iterative_deepening(states[0], max_depth=1) == (1, 1)
+    assert searcher.depth == 1
+
+    # a spent time budget still returns an action
+    action = minimax_search(bitboard_game, states[0], time_budget=0)
+    assert action in bitboard_game.actions(states[0])
+
+
+def test_parallel_search():
+    parallel = ParallelAlphaBeta(BitboardGame(), workers=2, table_size=1 << 12)
+
+    # the pool and the workers' tables are kept from one search to the next
+    for state in states[:50] + random.Random(0).sample(states, 50):
+        assert parallel.search(state) == minimax_action(state), state
+
+    parallel.close()
+
+    action = minimax_search(bitboard_game, states[0], workers=2)
+    assert action == minimax_action(states[0])
+
+    with pytest.raises(ValueError):
+        minimax_search(bitboard_game, states[0], workers=2, max_depth=2)
+
+
+def threat_score(game: mnk_game.Game, board: list[list[int | None]]) -> float:
+    """P1's threat score of a board, counted from scratch."""
+    scores = []
+
+    for line in game.lines:
+        pieces = [board[cell // game.columns][cell % game.columns] for cell in line]
+        scores.append(game.line_score(pieces.count(0), pieces.count(1)))
+
+    wins = [score for score in scores if math.isinf(score)]
+
+    return wins[0] if wins else sum(scores)
+
+
+@pytest.mark.parametrize(
+    "rows, columns, k, gravity", [(3, 3, 3, False), (4, 5, 4, False), (6, 7, 4, True)]
+)
+def test_mnk_threat_score(rows, columns, k, gravity):
+    game = mnk_game.Game(rows, columns, k, gravity)
+    rng = random.Random(0)
+
+    for _ in range(50):
+        state = game.initial_state()
+
+        while not game.is_terminal(state):
+            state = game.result(state, rng.choice(game.actions(state)))
+
+            assert state[2] == threat_score(game, state[1])
+            assert game.is_terminal(state) or -1 < game.evaluate(state) < 1
+
+
+def test_mnk_tic_tac_toe():
+    game = mnk_game.Game()
+    searcher = AlphaBeta(game, table=TranspositionTable())
+
+    assert searcher.search(game.initial_state()) is not None
+    assert searcher.root_value == 0
+
+
+def test_tablebase(tmp_path):
+    path = str(tmp_path / "tic_tac_toe.tb")
+
+    # BitboardGame only offers a winning move when there is one, so fewer
+    # than the 5478 legal positions are reachable
+    assert build(path) == 5208
+
+    tablebase = Tablebase(path)
+
+    for state in states:
+        assert tablebase.value(state) == minimax_value(state)
+        assert tablebase.best_action(state) == minimax_action(state)
+        assert tablebase.best_action(from_bitboard(state)) == minimax_action(state)
+
+    with pytest.raises(KeyError):
+        tablebase.value((1, 0, 0))
+
+    tablebase.close()
+
+
+@pytest.mark.parametrize("engine", [AlphaBeta, IterativeAlphaBeta])
+def test_symmetric_lines(engine):
+    # the table holds the best actions of the canonical states, which the
+    # principal variations have to be turned back from
+    game = SymmetricGame()
+    searcher = engine(game, table=TranspositionTable())
+
+    for state in states:
+        searcher.iterative_deepening(state)
+
+        for action in searcher.root_line:
+            assert action in game.actions(state), searcher.root_line
+            state = game.result(state, action)
+
+
+def test_selfplay():
+    assert selfplay.percentile([1, 2, 3, 4, 5], 50) == 3
+    assert selfplay.percentile(list(range(1, 151)), 99) == 149
+    assert selfplay.percentile([], 99) == 0
+
+    assert list(selfplay.jobs("halving_game", 3, 5, 6, 10, 1)) == [
+        ("halving_game", 5, 10, 1),
+        ("halving_game", 6, 11, 1),
+        ("halving_game", 5, 12, 1),
+    ]
+
+    # perfect play draws tic-tac-toe and wins the halving game for whoever
+    # the solver says wins it
+    assert selfplay.play(("tic_tac_toe", 0, 0, 0))["utility"] == 0
+
+    solver = halving_game.Solver(100)
+
+    for N in range(1, 100, 7):
+        record = selfplay.play(("halving_game", N, 0, 0))
+        assert record["utility"] == solver.value((0, N))
+
+    # the random opening moves come from the seed
+    record = selfplay.play(("bucket_game", 0, 3, 1))
+
+    assert record["opening_moves"] == 1
+    assert record["moves"] == selfplay.play(("bucket_game", 0, 3, 1))["moves"]
+
+
+def test_search_stats():
+    stats = SearchStats()
+    table = TranspositionTable()
+    action = minimax_search(bitboard_game, states[0], table=table, stats=stats)
+
+    # collecting stats does not change the search
+    searcher = AlphaBeta(BitboardGame(), table=TranspositionTable())
+
+    assert action == searcher.search(states[0])
+    assert stats.searches == 1
+    assert stats.nodes == searcher.nodes
+    assert stats.cutoffs == searcher.cutoffs
+    assert stats.table_hits == table.hits and stats.table_misses == table.misses
+    assert stats.terminal_evaluations == stats.calls["utility"] > 0
+    assert stats.expanded[0] == 1 and stats.branching_factors()[0] == 9
+
+    minimax_search(
+        bitboard_game, states[0], max_depth=2, evaluate=lambda state: 0, stats=stats
+    )
+
+    assert stats.searches == 2
+    assert [depth for depth, _, _ in stats.iterations] == [1, 2]
+    assert stats.heuristic_evaluations > 0
+    assert json.loads(stats.to_json())["nodes"] == stats.nodes
+
+
+def test_mcts_forced_wins():
+    # positions the player to move wins, late enough in the game that the
+    # win is only a few plies away
+    positions = [
+        state
+        for state in states
+        if minimax_value(state) == (1 if bitboard_game.to_move(state) == 0 else -1)
+        and (state[1] | state[2]).bit_count() >= 4
+    ]
+
+    for state in random.Random(0).sample(positions, 20):
+        winning = [
+            action
+            for action in bitboard_game.actions(state)
+            if minimax_value(bitboard_game.result(state, action))
+            == minimax_value(state)
+        ]
+        searcher = MCTS(BitboardGame(), iterations=2000, seed=0)
+
+        assert searcher.search(state) in winning, state
+
+
+def test_bench_regressions():
+    baseline = {"case": {"time": 1.0, "nodes": 100, "peak_memory": 10_000}}
+
+    def results(time: float, nodes: int, peak_memory: int) -> dict:
+        return {"case": {"time": time, "nodes": nodes, "peak_memory": peak_memory}}
+
+    def regressions(results: dict, metrics: list[str], speed: float = 1) -> list:
+        return bench.regressions(results, baseline, 0.5, metrics, speed)
+
+    assert not regressions(results(1.4, 100, 14_000), bench.METRICS)
+    assert regressions(results(1, 151, 10_000), ["nodes"]) == [
+        "case: nodes regressed from 100 to 151"
+    ]
+    assert len(regressions(results(2, 100, 20_000), bench.METRICS)) == 2
+
+    # times are scaled to the speed of this machine
+    assert not regressions(results(2, 100, 0), ["time"], speed=2)
+
+    # only the given metrics and the cases in the baseline are compared
+    assert not regressions(results(9, 100, 0), ["nodes"])
+    assert not regressions({"other": {"nodes": 1000}}, ["nodes"])
+
+    # node counts are the same on every machine, so the baseline's still hold
+    with open(bench.BASELINE_PATH) as file:
+        cases = json.load(file)["cases"]
+
+    for name, case in bench.CASES.items():
+        game, state = case()
+        stats = SearchStats()
+        minimax_search(game, state, stats=stats)
+
+        assert stats.nodes == cases[name]["nodes"], name
+
+
+@pytest.mark.parametrize("numpy", [True, False])
+def test_backward_induction(monkeypatch, numpy):
+    if not numpy:
+        monkeypatch.setattr(backward_induction, "np", None)
+    elif backward_induction.np is None:
+        pytest.skip("NumPy is not installed")
+
+    for state in states[:1] + random.Random(0).sample(states, 30):
+        tree = backward_induction.compile_game(bitboard_game, state)
+        values, best = backward_induction.solve(tree)
+
+        assert values[0] == minimax_value(state)
+        assert tree.actions[best[0]] == minimax_action(state)
+
+    game = halving_game.Game(40)
+    state = game.initial_state()
+    action = halving_game.Solver(40).best_action(state)
+
+    assert backward_induction.minimax_search(game, state) == action
+
+
+@pytest.mark.parametrize("game", [BitboardGame(), SymmetricGame()])
+def test_searcher(game):
+    for seed in range(10):
+        searcher = Searcher(game, game.initial_state())
+        rng = random.Random(seed)
+
+        # moves that are not the searched ones take the root off the principal
+        # variation, which must not change the answers
+        while not game.is_terminal(searcher.state):
+            action = searcher.search()
+            assert action == minimax_action(searcher.state)
+
+            state = searcher.state
+
+            for pv_action in searcher.pv:
+                assert pv_action in game.actions(state), searcher.pv
+                state = game.result(state, pv_action)
+
+            if rng.random() < 0.5:
+                action = rng.choice(game.actions(searcher.state))
+
+            searcher.advance(action)
+
+
+def test_parse_state():
+    empty = [[None] * 3 for _ in range(3)]
+    corner = [[0, None, None]] + empty[1:]
+
+    assert move_server.parse_state([0, empty]) == bitboard_game.initial_state()
+    assert move_server.parse_state([1, corner]) == (1, 1, 0)
+
+    for state in [
+        None,
+        [0],
+        [2, empty],
+        [1, empty],
+        [0.0, empty],
+        [True, empty],
+        [0, empty[:2]],
+        [1, [[1.0, None, None]] + empty[1:]],
+        [1, [[0, 0, 0], [1, 1, None], [None] * 3]],
+    ]:
+        with pytest.raises(ValueError):
+            move_server.parse_state(state)
+
+
+def test_move_server():
+    lines = [
+        json.dumps({"id": i, "state": [0, [[None] * 3] * 3]}).encode() for i in range(5)
+    ]
+
+    async def requests() -> tuple[list, dict, list]:
+        server = move_server.MoveServer(workers=1)
+
+        try:
+            # requests for the same state at once share one search, and the
+            # next request for it is answered from the cache
+            responses = await asyncio.gather(*map(server.respond, lines))
+            responses.append(await server.respond(lines[0]))
+            errors = [await server.respond(line) for line in (b"{", b"[]")]
+
+            return responses, server.stats(), errors
+        finally:
+            server.close()
+
+    responses, stats, errors = asyncio.run(requests())
+    action = list(minimax_action(states[0]))
+
+    assert responses == [{"id": i, "action": action} for i in [0, 1, 2, 3, 4, 0]]
+    assert stats["searches"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["cache_hits"] == 1
+    assert all("error" in error for error in errors)
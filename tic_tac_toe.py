@@ -1,9 +1,23 @@
 from copy import deepcopy
-import math
+import random
+
+from search import Searcher, TranspositionTable, minimax_search
 
 State = tuple[int, list[list[int | None]]]  # Tuple of player (whose turn it is),
 # and board
 Action = tuple[int, int]  # Where to place the player's piece
+BitState = tuple[int, int, int]  # Tuple of player (whose turn it is),
+# and a bitboard per player, where bit row * 3 + col is set if the player has
+# a piece on (row, col)
+
+# Zobrist keys: one random bitstring per (player, row, col) piece,
+# and one that is toggled whenever the turn passes to the other player
+_zobrist_random = random.Random(4136)
+ZOBRIST_PIECES = [
+    [[_zobrist_random.getrandbits(64) for col in range(3)] for row in range(3)]
+    for player in range(2)
+]
+ZOBRIST_TO_MOVE = _zobrist_random.getrandbits(64)
 
 
 class Game:
@@ -61,6 +75,24 @@ class Game:
 
         return all(board[i][2 - i] == player for i in range(3))
 
+    @staticmethod
+    def zobrist_hash(state: State) -> int:
+        player_index, board = state
+        key = ZOBRIST_TO_MOVE if player_index == 1 else 0
+
+        for row in range(3):
+            for col in range(3):
+                piece = board[row][col]
+
+                if piece is not None:
+                    key ^= ZOBRIST_PIECES[piece][row][col]
+
+        return key
+
+    def zobrist_update(self, key: int, state: State, action: Action) -> int:
+        row, col = action
+        return key ^ ZOBRIST_PIECES[self.to_move(state)][row][col] ^ ZOBRIST_TO_MOVE
+
     def result(self, state: State, action: Action) -> State:
         _, board = state
         row, col = action
@@ -117,64 +149,277 @@ class Game:
             print(f"It is P{self.to_move(state)+1}'s turn to move")
 
 
-def max_value(game: Game, state: State) -> float:
-    if game.is_terminal(state):
-        return game.utility(state, 0)
+FULL_BOARD = 0b111_111_111
+
+# The bits of every row, column and diagonal
+WIN_MASKS = (
+    [0b111 << (3 * row) for row in range(3)]
+    + [0b001_001_001 << col for col in range(3)]
+    + [0b100_010_001, 0b001_010_100]
+)
+
+# The bit and action of every cell, in the same order as Game.actions
+CELLS = [(1 << (row * 3 + col), (row, col)) for row in range(3) for col in range(3)]
+
+
+def to_bitboard(state: State) -> BitState:
+    player_index, board = state
+    bitboards = [0, 0]
+
+    for row in range(3):
+        for col in range(3):
+            piece = board[row][col]
+
+            if piece is not None:
+                bitboards[piece] |= 1 << (row * 3 + col)
+
+    return player_index, bitboards[0], bitboards[1]
+
+
+def from_bitboard(state: BitState) -> State:
+    player_index, x_bits, o_bits = state
+    board: list[list[int | None]] = [[None, None, None] for _ in range(3)]
+
+    for bit, (row, col) in CELLS:
+        if x_bits & bit:
+            board[row][col] = 0
+        elif o_bits & bit:
+            board[row][col] = 1
+
+    return player_index, board
+
+
+def has_line(bits: int) -> bool:
+    for mask in WIN_MASKS:
+        if bits & mask == mask:
+            return True
+
+    return False
+
+
+class BitboardGame:
+    """Tic-tac-toe on BitState, a drop-in replacement for Game in search.
+
+    The actions are the same (row, col) tuples as for Game, and to_bitboard and
+    from_bitboard convert states between the two representations.
+    """
+
+    @staticmethod
+    def initial_state() -> BitState:
+        return 0, 0, 0
+
+    @staticmethod
+    def to_move(state: BitState) -> int:
+        return state[0]
+
+    @staticmethod
+    def actions(state: BitState) -> list[Action]:
+        player_index, x_bits, o_bits = state
+        own = o_bits if player_index else x_bits
+        occupied = x_bits | o_bits
+        actions = []
+
+        for bit, action in CELLS:
+            if occupied & bit:
+                continue
+
+            # a winning move makes every other move pointless
+            if has_line(own | bit):
+                return [action]
+
+            actions.append(action)
+
+        return actions
+
+    @staticmethod
+    def is_winner(state: BitState, player: int) -> bool:
+        return has_line(state[1 + player])
+
+    @staticmethod
+    def result(state: BitState, action: Action) -> BitState:
+        player_index, x_bits, o_bits = state
+        row, col = action
+        bit = 1 << (row * 3 + col)
+
+        if player_index == 0:
+            return 1, x_bits | bit, o_bits
+
+        return 0, x_bits, o_bits | bit
+
+    @staticmethod
+    def is_terminal(state: BitState) -> bool:
+        player_index, x_bits, o_bits = state
+
+        # only the player who just moved can have won
+        if has_line(o_bits if player_index == 0 else x_bits):
+            return True
+
+        return x_bits | o_bits == FULL_BOARD
 
-    v = -math.inf
+    @staticmethod
+    def utility(state: BitState, player: int) -> int:
+        if has_line(state[1 + player]):
+            return 1
 
-    for action in game.actions(state):
-        result = game.result(state, action)
-        v = max(v, min_value(game, result))
+        if has_line(state[2 - player]):
+            return -1
 
-    assert v != -math.inf
+        return 0
+
+    @staticmethod
+    def zobrist_hash(state: BitState) -> int:
+        # the packed bitboards are already a collision-free key
+        player_index, x_bits, o_bits = state
+        return player_index << 18 | o_bits << 9 | x_bits
 
-    return v
+    @staticmethod
+    def zobrist_update(key: int, state: BitState, action: Action) -> int:
+        row, col = action
+        return key ^ 1 << (state[0] * 9 + row * 3 + col) ^ 1 << 18
 
+    @staticmethod
+    def print(state: BitState) -> None:
+        Game().print(from_bitboard(state))
+
+
+# The 8 symmetries of the board as maps from (row, col) to (row, col)
+SYMMETRIES = [
+    lambda row, col: (row, col),
+    lambda row, col: (col, 2 - row),  # Rotate 90 degrees clockwise
+    lambda row, col: (2 - row, 2 - col),  # Rotate 180 degrees
+    lambda row, col: (2 - col, row),  # Rotate 90 degrees counterclockwise
+    lambda row, col: (row, 2 - col),  # Mirror left to right
+    lambda row, col: (2 - row, col),  # Mirror top to bottom
+    lambda row, col: (col, row),  # Mirror in the main diagonal
+    lambda row, col: (2 - col, 2 - row),  # Mirror in the anti-diagonal
+]
+
+# Where every symmetry sends each cell, numbered row * 3 + col
+SYMMETRIC_CELLS = [
+    [row * 3 + col for row, col in (symmetry(*divmod(cell, 3)) for cell in range(9))]
+    for symmetry in SYMMETRIES
+]
+
+# Where the inverse of every symmetry sends each cell
+INVERSE_CELLS = [[cells.index(cell) for cell in range(9)] for cells in SYMMETRIC_CELLS]
+
+# What every symmetry turns each bitboard into
+SYMMETRIC_BITS = [
+    [
+        sum(1 << cells[cell] for cell in range(9) if bits >> cell & 1)
+        for bits in range(1 << 9)
+    ]
+    for cells in SYMMETRIC_CELLS
+]
+
+
+def canonical(state: BitState) -> tuple[BitState, int]:
+    """Returns the canonical form of the state and the index of the symmetry
+    in SYMMETRIES that turns the state into it.
+
+    The canonical form is the symmetric state with the smallest bitboards, so
+    all 8 symmetric states share it.
+    """
+    player_index, x_bits, o_bits = state
+    best = None
+    best_symmetry = 0
+
+    for symmetry, table in enumerate(SYMMETRIC_BITS):
+        boards = table[o_bits], table[x_bits]
+
+        if best is None or boards < best:
+            best = boards
+            best_symmetry = symmetry
+
+    assert best is not None
+
+    return (player_index, best[1], best[0]), best_symmetry
+
+
+def stabilizer(state: BitState) -> list[list[int]]:
+    """Returns SYMMETRIC_CELLS of the symmetries that leave the board as it is."""
+    _, x_bits, o_bits = state
+
+    return [
+        cells
+        for cells, table in zip(SYMMETRIC_CELLS, SYMMETRIC_BITS)
+        if table[x_bits] == x_bits and table[o_bits] == o_bits
+    ]
+
+
+class SymmetricGame(BitboardGame):
+    """BitboardGame that treats the 8 symmetric versions of a state as one.
+
+    Actions that lead to symmetric states are pruned down to the first one,
+    and transposition table keys are computed on the canonical form of the
+    state. States are never transformed: the table holds best actions in the
+    orientation of the canonical form, and canonical_action and
+    oriented_action turn them to and from the caller's, so searches return
+    the same action as on BitboardGame.
+    """
 
-def min_value(game: Game, state: State) -> float:
-    if game.is_terminal(state):
-        return game.utility(state, 0)
+    @staticmethod
+    def actions(state: BitState) -> list[Action]:
+        actions = BitboardGame.actions(state)
+        symmetries = stabilizer(state)
 
-    v = math.inf
+        if len(symmetries) == 1:
+            return actions
 
-    for action in game.actions(state):
-        result = game.result(state, action)
-        v = min(v, max_value(game, result))
+        return [
+            (row, col)
+            for row, col in actions
+            if all(cells[row * 3 + col] >= row * 3 + col for cells in symmetries)
+        ]
 
-    assert v != math.inf
+    @staticmethod
+    def canonical_action(state: BitState, action: Action) -> Action:
+        """Returns the action of the canonical form of the state that matches
+        action in the state."""
+        row, col = action
 
-    return v
+        return divmod(SYMMETRIC_CELLS[canonical(state)[1]][row * 3 + col], 3)
 
+    @staticmethod
+    def oriented_action(state: BitState, action: Action) -> Action:
+        """Returns the action among actions(state) that matches action in the
+        canonical form of the state."""
+        player_index, x_bits, o_bits = state
+        row, col = action
+        cell = INVERSE_CELLS[canonical(state)[1]][row * 3 + col]
 
-def minimax_search(game: Game, state: State) -> Action | None:
-    best_action = None
-    best_value = -math.inf
+        # actions only offers the first winning move, which may be another
+        # one in this orientation
+        if has_line((o_bits if player_index else x_bits) | 1 << cell):
+            return SymmetricGame.actions(state)[0]
 
-    for action in game.actions(state):
-        result = game.result(state, action)
-        v = min_value(game, result)
+        # and the smallest of the cells the board maps onto each other
+        return divmod(min(cells[cell] for cells in stabilizer(state)), 3)
 
-        if v > best_value:
-            best_value = v
-            best_action = action
+    @staticmethod
+    def zobrist_hash(state: BitState) -> int:
+        return BitboardGame.zobrist_hash(canonical(state)[0])
 
-    return best_action
+    @staticmethod
+    def zobrist_update(key: int, state: BitState, action: Action) -> int:
+        return SymmetricGame.zobrist_hash(BitboardGame.result(state, action))
 
 
 if __name__ == "__main__":
     game = Game()
 
     state = game.initial_state()
+    searcher = Searcher(  # Shared by both players, since values are P1's
+        game, state, table=TranspositionTable()
+    )
     game.print(state)
 
     while not game.is_terminal(state):
         player = game.to_move(state)
-        action = minimax_search(game, state)  # The player whose turn it is
-        # is the MAX player
+        action = searcher.search()  # The player whose turn it is is the MAX player
         print(f"P{player+1}'s action: {action}")
 
         assert action is not None
 
-        state = game.result(state, action)
+        state = searcher.advance(action)
         game.print(state)